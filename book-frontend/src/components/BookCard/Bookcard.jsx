@@ -66,11 +66,17 @@ const BookCard = ({ book, onFavoriteToggle, showActions = true }) => {
     <div className="book-card">
       <Link to={`/books/${book.id}`} className="book-card-link">
         <div className="book-card-image">
-          <img
-            src={book.image || defaultImage}
-            alt={book.title}
-            onError={(e) => (e.target.src = defaultImage)}
-          />
+          <picture>
+            {book.image_variants?.medium && (
+              <source srcSet={book.image_variants.medium.webp} type="image/webp" />
+            )}
+            <img
+              src={book.image_variants?.medium?.jpeg || book.image || defaultImage}
+              alt={book.title}
+              loading="lazy"
+              onError={(e) => (e.target.src = defaultImage)}
+            />
+          </picture>
           <div className="book-card-overlay">
             <FiEye className="view-icon" />
             <span>مشاهده جزئیات</span>
@@ -41,9 +41,8 @@ const Navbar = () => {
 
   const fetchNotificationCount = async () => {
     try {
-      const response = await api.get("/notifications/");
-      const unread = response.data.filter((n) => !n.is_read).length;
-      setNotificationCount(unread);
+      const response = await api.get("/notifications/unread-count/");
+      setNotificationCount(response.data.unread_count);
     } catch (error) {
       console.error("Error fetching notifications:", error);
     }
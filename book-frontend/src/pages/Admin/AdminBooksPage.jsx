@@ -6,46 +6,45 @@ import "./AdminPages.css";
 
 const AdminBooksPage = () => {
   const [books, setBooks] = useState([]);
-  const [filteredBooks, setFilteredBooks] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState("");
   const [filterStatus, setFilterStatus] = useState("all");
 
   useEffect(() => {
     fetchBooks();
-  }, []);
+  }, [searchTerm, filterStatus]);
 
-  useEffect(() => {
-    let filtered = books;
+  const fetchBooks = async () => {
+    try {
+      const params = new URLSearchParams();
 
-    if (searchTerm) {
-      filtered = filtered.filter(
-        (book) =>
-          book.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-          book.author.toLowerCase().includes(searchTerm.toLowerCase()),
-      );
-    }
+      // Filtered by the API, so every matching book is reachable page by page
+      if (searchTerm) params.append("search", searchTerm);
+      if (filterStatus === "pending") params.append("is_approved", "false");
+      if (filterStatus === "approved") params.append("is_approved", "true");
 
-    if (filterStatus !== "all") {
-      if (filterStatus === "pending") {
-        filtered = filtered.filter((book) => !book.is_approved);
-      } else if (filterStatus === "approved") {
-        filtered = filtered.filter((book) => book.is_approved);
-      }
+      const response = await api.get(`/books/?${params}`);
+      setBooks(response.data.results);
+      setNextPage(response.data.next);
+    } catch (error) {
+      toast.error("خطا در دریافت کتاب‌ها");
+    } finally {
+      setLoading(false);
     }
+  };
 
-    setFilteredBooks(filtered);
-  }, [searchTerm, filterStatus, books]);
-
-  const fetchBooks = async () => {
+  const loadMore = async () => {
     try {
-      const response = await api.get("/books/");
-      setBooks(response.data);
-      setFilteredBooks(response.data);
+      setLoadingMore(true);
+      const response = await api.get(nextPage);
+      setBooks((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
     } catch (error) {
       toast.error("خطا در دریافت کتاب‌ها");
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -122,7 +121,7 @@ const AdminBooksPage = () => {
                 </tr>
               </thead>
               <tbody>
-                {filteredBooks.map((book) => (
+                {books.map((book) => (
                   <tr key={book.id}>
                     <td>
                       <img
@@ -176,6 +175,17 @@ const AdminBooksPage = () => {
                 ))}
               </tbody>
             </table>
+            {nextPage && (
+              <div className="load-more">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="btn btn-secondary"
+                >
+                  {loadingMore ? "در حال بارگذاری..." : "نمایش بیشتر"}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       </div>
@@ -8,6 +8,8 @@ const BooksPage = () => {
   const [books, setBooks] = useState([]);
   const [categories, setCategories] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filters, setFilters] = useState({
     search: "",
     category: "",
@@ -38,6 +40,7 @@ const BooksPage = () => {
   const fetchBooks = async () => {
     try {
       setLoading(true);
+      setNextPage(null);
       const params = new URLSearchParams();
 
       if (filters.search) params.append("search", filters.search);
@@ -49,7 +52,8 @@ const BooksPage = () => {
       if (filters.ordering) params.append("ordering", filters.ordering);
 
       const response = await api.get(`/books/?${params}`);
-      setBooks(Array.isArray(response.data) ? response.data : []);
+      setBooks(Array.isArray(response.data.results) ? response.data.results : []);
+      setNextPage(response.data.next);
     } catch (error) {
       console.error("Error fetching books:", error);
       setBooks([]);
@@ -58,6 +62,19 @@ const BooksPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await api.get(nextPage);
+      setBooks((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error("Error fetching books:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleFilterChange = (key, value) => {
     setFilters((prev) => ({ ...prev, [key]: value }));
   };
@@ -160,11 +177,24 @@ const BooksPage = () => {
               <div className="loading"></div>
             </div>
           ) : books.length > 0 ? (
-            <div className="books-grid">
-              {books.map((book) => (
-                <BookCard key={book.id} book={book} />
-              ))}
-            </div>
+            <>
+              <div className="books-grid">
+                {books.map((book) => (
+                  <BookCard key={book.id} book={book} />
+                ))}
+              </div>
+              {nextPage && (
+                <div className="load-more">
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="btn btn-secondary"
+                  >
+                    {loadingMore ? "در حال بارگذاری..." : "نمایش بیشتر"}
+                  </button>
+                </div>
+              )}
+            </>
           ) : (
             <div className="no-results">
               <p>کتابی یافت نشد</p>
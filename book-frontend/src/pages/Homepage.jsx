@@ -27,8 +27,9 @@ const HomePage = () => {
 
   const fetchFeaturedBooks = async () => {
     try {
-      const response = await api.get("/books/?ordering=-created_at");
-      setFeaturedBooks(response.data.slice(0, 8));
+      // The eight newest books: one short page, no need to follow `next`
+      const response = await api.get("/books/?page_size=8");
+      setFeaturedBooks(response.data.results);
     } catch (error) {
       console.error("Error fetching books:", error);
     } finally {
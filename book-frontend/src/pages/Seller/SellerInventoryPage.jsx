@@ -8,6 +8,8 @@ import "./SellerPages.css";
 const SellerInventoryPage = () => {
   const [books, setBooks] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchInventory();
@@ -16,7 +18,8 @@ const SellerInventoryPage = () => {
   const fetchInventory = async () => {
     try {
       const response = await api.get("/books/my-inventory/");
-      setBooks(response.data);
+      setBooks(response.data.results);
+      setNextPage(response.data.next);
     } catch (error) {
       toast.error("خطا در دریافت کتاب‌ها");
     } finally {
@@ -24,6 +27,19 @@ const SellerInventoryPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await api.get(nextPage);
+      setBooks((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      toast.error("خطا در دریافت کتاب‌ها");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (id) => {
     if (!window.confirm("آیا از حذف این کتاب اطمینان دارید؟")) return;
 
@@ -123,6 +139,17 @@ const SellerInventoryPage = () => {
                   ))}
                 </tbody>
               </table>
+              {nextPage && (
+                <div className="load-more">
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="btn btn-secondary"
+                  >
+                    {loadingMore ? "در حال بارگذاری..." : "نمایش بیشتر"}
+                  </button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="empty-state">
@@ -7,6 +7,8 @@ import "./UserPages.css";
 const NotificationsPage = () => {
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchNotifications();
@@ -15,7 +17,8 @@ const NotificationsPage = () => {
   const fetchNotifications = async () => {
     try {
       const response = await api.get("/notifications/");
-      setNotifications(response.data);
+      setNotifications(response.data.results);
+      setNextPage(response.data.next);
     } catch (error) {
       toast.error("خطا در دریافت اعلان‌ها");
     } finally {
@@ -23,6 +26,19 @@ const NotificationsPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await api.get(nextPage);
+      setNotifications((prev) => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      toast.error("خطا در دریافت اعلان‌ها");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleMarkAsRead = async (id) => {
     try {
       await api.post(`/notifications/${id}/mark-as-read/`);
@@ -79,6 +95,17 @@ const NotificationsPage = () => {
                   )}
                 </div>
               ))}
+              {nextPage && (
+                <div className="load-more">
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="btn btn-secondary"
+                  >
+                    {loadingMore ? "در حال بارگذاری..." : "نمایش بیشتر"}
+                  </button>
+                </div>
+              )}
             </div>
           ) : (
             <div className="empty-state">
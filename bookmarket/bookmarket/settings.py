@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .db_profiles import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,9 +49,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Per-route request metrics served at /metrics, see METRICS below
+    'core.middleware.MetricsMiddleware',
         "corsheaders.middleware.CorsMiddleware",
 
     'django.middleware.security.SecurityMiddleware',
+    # gzip / br / zstd, see RESPONSE_COMPRESSION below
+    'core.middleware.CompressionMiddleware',
+    # Safe-method reads to replicas, see DATABASE_REPLICAS below
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +66,18 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Negotiated response compression (see core/middleware.py). Brotli and
+# Zstandard are used when the `brotli` / `zstandard` packages are installed.
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 512,
+    'PREFERENCE': ('br', 'zstd', 'gzip'),
+    'LEVELS': {'br': 5, 'zstd': 3, 'gzip': 6},
+    # Streaming responses are flushed to the client after this many input
+    # bytes or seconds, whichever comes first
+    'FLUSH_SIZE': 16 * 1024,
+    'FLUSH_INTERVAL': 0.5,
+}
+
 ROOT_URLCONF = 'bookmarket.urls'
 
 TEMPLATES = [
@@ -80,11 +101,43 @@ WSGI_APPLICATION = 'bookmarket.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Tuned SQLite profiles (WAL, pragmas, persistent connections) live in
+# bookmarket/db_profiles.py; choose one with BOOKMARKET_DB_PROFILE.
+# db.sqlite3 is the tracked sample dataset (it goes with media/book_covers);
+# its -wal/-shm companions are not tracked. `manage.py migrate` brings it
+# up to date.
+DB_PROFILE = os.environ.get('BOOKMARKET_DB_PROFILE', 'development' if DEBUG else 'production')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        **sqlite_database(BASE_DIR / 'db.sqlite3', DB_PROFILE),
+        # A file rather than Django's shared in-memory database, which fails
+        # concurrent writers with "database table is locked" instead of
+        # letting them wait: tests with threads see the server's locking
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+}
+
+# Read replicas (see core/db_routers.py). Locally a copy of db.sqlite3 can
+# stand in for one: BOOKMARKET_REPLICA_DB=replica.sqlite3
+REPLICA_DB = os.environ.get('BOOKMARKET_REPLICA_DB')
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        **sqlite_database(BASE_DIR / REPLICA_DB, DB_PROFILE),
+        # Tests run against the primary only
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+
+DATABASE_REPLICAS = {
+    # Alias -> weight
+    'ALIASES': {'replica': 1} if REPLICA_DB else {},
+    # Read-mostly models whose safe-method reads may go to a replica
+    'MODELS': ('core.Book', 'core.Category', 'core.SiteStats'),
+    # Seconds a client stays on the primary after writing (read-your-writes)
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
 }
 
 
@@ -130,21 +183,139 @@ import os
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored under the hash of their content, so identical covers
+# are kept once and every stored name is immutable (see core/media.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'core.media.ContentHashStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# /media/ responses. OFFLOAD: None, 'x-sendfile' (Apache/lighttpd) or
+# 'x-accel-redirect' (nginx, with an internal location at ACCEL_PREFIX).
+MEDIA_SERVING = {
+    'MAX_AGE': 3600,
+    'OFFLOAD': None,
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',
         # 'rest_framework.authentication.SessionAuthentication'
         # 'rest_framework.authentication.SessionAuthentication', 
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # BasicAuthentication that caches verified credentials (see core/authentication.py)
+        'core.authentication.CachedBasicAuthentication',
+        # JWTAuthentication without the per-request user SELECT (see core/authentication.py)
+        'core.authentication.CachedJWTAuthentication',
         
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # orjson-based JSON (see core/renderers.py); swap back to
+    # rest_framework.renderers.JSONRenderer / parsers.JSONParser to compare
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 AUTH_USER_MODEL = 'core.User'
+
+# Seconds a verified Basic auth username/password pair skips the password hasher
+BASIC_AUTH_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+SIMPLE_JWT = {
+    # Puts role / is_staff claims into the tokens for CachedJWTAuthentication
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.RoleTokenObtainPairSerializer',
+}
+
+# Process-local LRU of users behind CachedJWTAuthentication
+JWT_USER_CACHE = {
+    'ALIAS': 'default',
+    'MAX_SIZE': 1024,
+    # Seconds a cached row is used before it is reloaded
+    'TTL': 30,
+}
+
+# Backend used by BookViewSet for ?search= (see core/search.py)
+BOOK_SEARCH_BACKEND = 'core.search.SQLiteFTSBackend'
+
+# Per-action SQL budgets declared on views (see core/querybudget.py): 'off', 'warn' or 'raise'
+QUERY_BUDGET_MODE = 'warn' if DEBUG else 'off'
+
+# The catalogue and category version stamps, the JWT user change stamps and
+# the replica pins must be seen by every process serving requests: set
+# BOOKMARKET_REDIS_URL (e.g. redis://127.0.0.1:6379/0) whenever there is more
+# than one. With REQUIRE_SHARED_CACHE the app refuses to start on a
+# process-local cache (see core/cache.py); only the single-process dev
+# server may do without.
+REDIS_URL = os.environ.get('BOOKMARKET_REDIS_URL')
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+        if REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+REQUIRE_SHARED_CACHE = not DEBUG
+
+# Public /api/books/ result cache (see core/cache.py)
+CATALOGUE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'STALE_TIMEOUT': 600,
+    'LOCK_TIMEOUT': 10,
+}
+
+# Process-local category map, re-checked against a shared version stamp
+CATEGORY_CACHE = {
+    'ALIAS': 'default',
+    'CHECK_INTERVAL': 5,
+}
+
+# Signal-driven notifications are queued in NotificationOutbox (see core/outbox.py).
+# Turn IN_PROCESS_WORKER off when running `manage.py process_outbox` instead.
+NOTIFICATION_OUTBOX = {
+    'IN_PROCESS_WORKER': True,
+    'BATCH_SIZE': 500,
+    'MAX_ATTEMPTS': 5,
+    # Seconds a worker owns the rows it claimed; then they are due again
+    'CLAIM_TIMEOUT': 60,
+}
+
+# Cover variants (see core/images.py): name -> longest side in pixels.
+# Each size is stored as JPEG and WebP by BOOK_IMAGE_WORKERS background threads.
+BOOK_IMAGE_SIZES = {
+    'thumb': 200,
+    'medium': 600,
+}
+BOOK_IMAGE_WORKERS = 2
+
+# Request metrics by route name (see core/metrics.py), served at /metrics.
+# With pre-forked workers (gunicorn, uwsgi) point MULTIPROCESS_DIR at an
+# empty directory so /metrics adds up every worker; leave it unset for a
+# single process. Only staff sessions and scrapers sending
+# `Authorization: Bearer <TOKEN>` may read /metrics, unless PUBLIC is set.
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': os.environ.get('BOOKMARKET_METRICS_DIR'),
+    'FLUSH_INTERVAL': 1,
+    'TOKEN': os.environ.get('BOOKMARKET_METRICS_TOKEN'),
+    'PUBLIC': False,
+}
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:3000",
 ]
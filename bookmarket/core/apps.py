@@ -6,4 +6,7 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         # Importing signals to ensure they are registered when the app starts
-        import core.signals
\ No newline at end of file
+        import core.signals
+
+        from core.cache import check_shared_caches
+        check_shared_caches()
\ No newline at end of file
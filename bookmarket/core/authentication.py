@@ -0,0 +1,240 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+# core/authentication.py
+
+CREDENTIALS_SALT = 'core.authentication.credentials'
+FINGERPRINT_SALT = 'core.authentication.fingerprint'
+
+
+def get_option(name, default):
+    return getattr(settings, 'BASIC_AUTH_CACHE', {}).get(name, default)
+
+
+def credentials_fingerprint(user):
+    """
+    Digest of the stored username and password hash. It changes whenever
+    set_password() is saved (a new salt every time), when the hasher
+    upgrades the hash, or when the user is renamed.
+    """
+    value = f'{user.get_username()}\0{user.password}'
+    return salted_hmac(FINGERPRINT_SALT, value, algorithm='sha256').hexdigest()
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    BasicAuthentication that remembers successful logins for a short time
+    (BASIC_AUTH_CACHE['TIMEOUT'] seconds), so scripted clients that send
+    the same credentials on every call only pay for the password hasher
+    once per period.
+
+    The cache key is an HMAC of username+password keyed with SECRET_KEY, so
+    neither the password nor a fast unkeyed hash of it is ever stored.
+    A hit still loads the user row and checks that its current password
+    hash matches the one that was verified: any password change (the reset
+    flow in PasswordResetConfirmView, a profile update, set_password in the
+    shell) and any deactivation takes effect on the very next request.
+    Failed logins are never cached and always run the full check.
+    """
+
+    @property
+    def cache(self):
+        return caches[get_option('ALIAS', 'default')]
+
+    def make_key(self, userid, password):
+        digest = salted_hmac(CREDENTIALS_SALT, f'{userid}\0{password}', algorithm='sha256').hexdigest()
+        return 'auth:basic:' + digest
+
+    def authenticate_credentials(self, userid, password, request=None):
+        key = self.make_key(userid, password)
+        entry = self.cache.get(key)
+        if entry is not None:
+            user = get_user_model()._default_manager.filter(pk=entry['user']).first()
+            if (
+                user is not None
+                and user.is_active
+                and constant_time_compare(entry['fingerprint'], credentials_fingerprint(user))
+            ):
+                return (user, None)
+            self.cache.delete(key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        self.cache.set(
+            key,
+            {'user': user.pk, 'fingerprint': credentials_fingerprint(user)},
+            timeout=get_option('TIMEOUT', 300),
+        )
+        return (user, auth)
+
+
+# Claims copied into every token by RoleTokenObtainPairSerializer
+TOKEN_USER_FIELDS = ('role', 'is_staff', 'is_active')
+CLAIMS_ISSUED_AT = 'claims_at'
+CREDENTIALS_CLAIM = 'credentials'
+
+
+def token_credentials(user):
+    """
+    Short credentials fingerprint stored in the tokens: tokens issued
+    before a password change stop being accepted.
+    """
+    return credentials_fingerprint(user)[:32]
+
+
+def is_privileged(values):
+    """
+    True for staff and admin users, given a User or a token. Their
+    claims and cached rows are never trusted: every request loads the row.
+    """
+    if isinstance(values, get_user_model()):
+        return values.is_staff or values.role == 'admin'
+    return bool(values.get('is_staff')) or values.get('role') == 'admin'
+
+
+class UserCache:
+    """
+    Bounded, process-local LRU of the rows of non-privileged users for
+    token authentication. Rows expire after JWT_USER_CACHE['TTL'] seconds.
+
+    Every save or delete of a user stamps the time of the change in the
+    shared Django cache (and drops the local copy). A cached row, or the
+    claims inside a token, are only trusted when they are newer than that
+    stamp, so a role change, deactivation or password reset is seen by every
+    worker on its next request. The stamps need a cache shared by all
+    processes (see core.cache.check_shared_caches).
+    """
+
+    def __init__(self):
+        options = getattr(settings, 'JWT_USER_CACHE', {})
+        self.alias = options.get('ALIAS', 'default')
+        self.max_size = options.get('MAX_SIZE', 1024)
+        self.ttl = options.get('TTL', 30)
+        self.lock = threading.Lock()
+        self.rows = OrderedDict()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def stamp_key(self, user_id):
+        return f'auth:user:{user_id}:changed'
+
+    def changed_at(self, user_id):
+        return self.cache.get(self.stamp_key(user_id))
+
+    def get(self, user_id, changed_at=None):
+        """
+        Return a private copy of the user's row, loading it when missing,
+        expired or older than `changed_at`. Rows of privileged users are
+        always loaded and never kept. Raises User.DoesNotExist.
+        """
+        with self.lock:
+            entry = self.rows.get(user_id)
+            if entry is not None:
+                self.rows.move_to_end(user_id)
+        if (
+            entry is not None
+            and time.time() - entry[0] < self.ttl
+            and (changed_at is None or entry[0] > changed_at)
+        ):
+            return copy.copy(entry[1])
+
+        loaded_at = time.time()
+        user = get_user_model()._default_manager.get(pk=user_id)
+        with self.lock:
+            if is_privileged(user):
+                self.rows.pop(user_id, None)
+                return user
+            self.rows[user_id] = (loaded_at, user)
+            self.rows.move_to_end(user_id)
+            while len(self.rows) > self.max_size:
+                self.rows.popitem(last=False)
+        return copy.copy(user)
+
+    def invalidate(self, user_id):
+        # Outlive every token that might still carry the old claims
+        self.cache.set(
+            self.stamp_key(user_id), time.time(),
+            timeout=int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+        )
+        with self.lock:
+            self.rows.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+def user_from_claims(user_id, token):
+    """
+    Build a User from the token alone. Only id, role, is_staff and is_active
+    are set; reading any other field loads the rest of the row in one query
+    (see User.refresh_from_db).
+    """
+    User = get_user_model()
+    known = {'id': user_id, **{name: token[name] for name in TOKEN_USER_FIELDS}}
+    # from_db() expects the values in field order
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in known]
+    user = User.from_db(router.db_for_read(User), names, [known[name] for name in names])
+    user._from_token = True
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request SELECT on core_user for
+    regular (non-staff, non-admin) users.
+
+    request.user is a copy of the row from `user_cache`, or, when the
+    process has not seen the user yet, a User built from the role/is_staff/
+    is_active claims of the token. Either way it is only used when the user
+    has not been changed since (see UserCache); otherwise the row is
+    reloaded. Staff and admin users are loaded on every request, whatever
+    their token says. Tokens issued before a password change are rejected.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            # Tokens carry the id as a string; user_cache is keyed by primary key
+            user_id = get_user_model()._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        changed_at = user_cache.changed_at(user_id)
+        claims_at = validated_token.get(CLAIMS_ISSUED_AT)
+        trust_claims = (
+            claims_at is not None
+            and all(name in validated_token for name in TOKEN_USER_FIELDS)
+            and not is_privileged(validated_token)
+            and (changed_at is None or claims_at > changed_at)
+        )
+
+        with user_cache.lock:
+            cached = user_id in user_cache.rows
+        if not cached and trust_claims:
+            user = user_from_claims(user_id, validated_token)
+        else:
+            try:
+                user = user_cache.get(user_id, changed_at)
+            except get_user_model().DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            credentials = validated_token.get(CREDENTIALS_CLAIM)
+            if credentials is not None and not constant_time_compare(credentials, token_credentials(user)):
+                raise AuthenticationFailed(_("Password changed since the token was issued"), code="password_changed")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
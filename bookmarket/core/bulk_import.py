@@ -0,0 +1,131 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import stats
+from .cache import category_map
+from .models import Book, Category
+from .serializers import BookSerializer
+
+# core/bulk_import.py
+
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+CHUNK_SIZE = 500
+
+
+class CachedCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Category lookup against the in-process category map, so validating
+    thousands of rows does not cost one SELECT per row.
+    """
+
+    def to_internal_value(self, data):
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        name = category_map.name_for(pk)
+        if name is None:
+            self.fail('does_not_exist', pk_value=pk)
+        return Category(id=pk, name=name)
+
+
+class BookImportSerializer(BookSerializer):
+    category = CachedCategoryField(queryset=Category.objects.all(), allow_null=True, required=False)
+
+    class Meta(BookSerializer.Meta):
+        fields = ['title', 'author', 'category', 'price', 'condition', 'description']
+
+
+def detect_format(request):
+    """
+    Return (format, line iterator) for a bulk upload, or (None, None) for a
+    regular single-book POST. Accepts a raw text/csv or NDJSON body, or a
+    multipart upload in a `file` field (.csv / .ndjson / .jsonl).
+    """
+    content_type = request.content_type.split(';')[0].strip()
+    if content_type in CSV_TYPES:
+        return 'csv', iter(request.stream.readline, b'')
+    if content_type in NDJSON_TYPES:
+        return 'ndjson', iter(request.stream.readline, b'')
+    if content_type != 'multipart/form-data':
+        return None, None
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return None, None
+    name = upload.name.lower()
+    if upload.content_type in NDJSON_TYPES or name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson', iter(upload)
+    return 'csv', iter(upload)
+
+
+def parse_csv(lines):
+    """
+    Yield (line number, row dict, parse error) from an iterator of byte
+    lines. The header row names the columns.
+    """
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key}, None
+
+
+def parse_ndjson(lines):
+    decoded = codecs.iterdecode(lines, 'utf-8-sig')
+    for number, line in enumerate(decoded, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f'Invalid JSON: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Each line must be a JSON object.'
+            continue
+        yield number, row, None
+
+
+def import_books(fmt, lines, seller, chunk_size=CHUNK_SIZE):
+    """
+    Validate and insert books `chunk_size` rows at a time.
+    Only the current chunk is ever held in memory. Valid rows of a chunk
+    are inserted with one bulk_create as pending books; invalid rows are
+    reported by their line number.
+    """
+    rows = parse_csv(lines) if fmt == 'csv' else parse_ndjson(lines)
+    report = {'created': 0, 'failed': 0, 'errors': []}
+    # One serializer validates every row (like ListSerializer's child), so
+    # its fields are only built once
+    validator = BookImportSerializer()
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        books = []
+        for line, data, error in chunk:
+            if error:
+                report['errors'].append({'line': line, 'errors': {'non_field_errors': [error]}})
+                continue
+            try:
+                validated = validator.run_validation(data)
+            except serializers.ValidationError as exc:
+                report['errors'].append({'line': line, 'errors': serializers.as_serializer_error(exc)})
+                continue
+            books.append(Book(**validated, seller=seller, is_approved=False, status='pending'))
+
+        with transaction.atomic():
+            Book.objects.bulk_create(books)
+            # bulk_create skips post_save, so update the counters here
+            stats.apply_delta({'total_books': len(books), 'pending_books': len(books)})
+        report['created'] += len(books)
+
+    report['failed'] = len(report['errors'])
+    return report
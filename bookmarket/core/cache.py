@@ -0,0 +1,224 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.response import Response
+
+from . import db_routers
+
+# core/cache.py
+
+# Backends whose contents other processes cannot see
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def shared_state_aliases():
+    """
+    (setting, cache alias) of every feature that keeps cross-process state
+    (version stamps, pins) in the Django cache.
+    """
+    aliases = [
+        ('CATALOGUE_CACHE', getattr(settings, 'CATALOGUE_CACHE', {}).get('ALIAS', 'default')),
+        ('CATEGORY_CACHE', getattr(settings, 'CATEGORY_CACHE', {}).get('ALIAS', 'default')),
+        ('JWT_USER_CACHE', getattr(settings, 'JWT_USER_CACHE', {}).get('ALIAS', 'default')),
+    ]
+    replicas = getattr(settings, 'DATABASE_REPLICAS', {})
+    if replicas.get('ALIASES'):
+        aliases.append(('DATABASE_REPLICAS', replicas.get('CACHE_ALIAS', 'default')))
+    return aliases
+
+
+def check_shared_caches():
+    """
+    With settings.REQUIRE_SHARED_CACHE, raise ImproperlyConfigured when one
+    of those features uses a process-local cache: each worker would only
+    see its own invalidations and pins. Called from CoreConfig.ready().
+    """
+    if not getattr(settings, 'REQUIRE_SHARED_CACHE', False):
+        return
+    local = [
+        f"{setting} (cache '{alias}')"
+        for setting, alias in shared_state_aliases()
+        if isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
+    ]
+    if local:
+        raise ImproperlyConfigured(
+            f"{', '.join(local)} need a cache shared by all processes; "
+            "set BOOKMARKET_REDIS_URL or configure a Redis / Memcached backend."
+        )
+
+
+class CatalogueCache:
+    """
+    Result cache for the public (non-admin) book catalogue.
+
+    Entries are keyed on the normalized query string and tagged with a
+    shared catalogue version. Any change to a Book bumps the version, which
+    turns every cached page stale at once. A stale page keeps being served
+    while a single worker (the one that wins the refresh lock) rebuilds it,
+    i.e. stale-while-revalidate.
+    """
+    version_key = 'catalogue:version'
+
+    def __init__(self):
+        options = getattr(settings, 'CATALOGUE_CACHE', {})
+        self.alias = options.get('ALIAS', 'default')
+        # Seconds a page is considered fresh
+        self.timeout = options.get('TIMEOUT', 60)
+        # Seconds a stale page may still be served while it is rebuilt
+        self.stale_timeout = options.get('STALE_TIMEOUT', 600)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, 1, timeout=None)
+            version = self.cache.get(self.version_key, 1)
+        return version
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            # Key missing (evicted or never set)
+            self.cache.add(self.version_key, 1, timeout=None)
+
+    def make_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+            if value != ''
+        )
+        raw = f'{request.get_host()}|{params}'
+        return 'catalogue:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def get_or_build(self, request, build):
+        """
+        Return the cached Response for this request, building it with
+        `build()` when needed. Only 200 responses are cached. The X-Cache
+        header tells whether the page was a HIT, STALE or MISS.
+        """
+        key = self.make_key(request)
+        version = self.get_version()
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            if entry['version'] == version and entry['expires'] > time.time():
+                return self.respond(entry['data'], 'HIT')
+            # Someone else is already refreshing this page: keep serving the old one
+            if not self.cache.add(key + ':lock', 1, timeout=self.lock_timeout):
+                return self.respond(entry['data'], 'STALE')
+
+        # From the primary: a page read from a lagging replica would be
+        # cached under the new version until the next write
+        token = db_routers.activate(None)
+        try:
+            response = build()
+            if response.status_code == 200:
+                self.cache.set(key, {
+                    'version': version,
+                    'expires': time.time() + self.timeout,
+                    'data': response.data,
+                }, timeout=self.timeout + self.stale_timeout)
+        finally:
+            db_routers.deactivate(token)
+            if entry is not None:
+                self.cache.delete(key + ':lock')
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def respond(self, data, state):
+        response = Response(data)
+        response['X-Cache'] = state
+        return response
+
+
+catalogue_cache = CatalogueCache()
+
+
+class CategoryMap:
+    """
+    Process-local {id: name} map of all categories.
+
+    Categories change rarely, so every worker keeps its own copy and only
+    compares a shared version stamp (stored in the Django cache) against
+    its local one, at most once every CHECK_INTERVAL seconds. Editing a
+    category bumps the shared stamp, and every worker reloads on its next
+    check. The stamp lives in a shared backend (Redis, Memcached) as soon
+    as several processes serve requests, see check_shared_caches.
+    """
+    version_key = 'categories:version'
+
+    def __init__(self):
+        options = getattr(settings, 'CATEGORY_CACHE', {})
+        self.alias = options.get('ALIAS', 'default')
+        self.check_interval = options.get('CHECK_INTERVAL', 5)
+        self.lock = threading.Lock()
+        self.names = None
+        self.version = None
+        self.checked_at = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def shared_version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, 1, timeout=None)
+            version = self.cache.get(self.version_key, 1)
+        return version
+
+    def load(self):
+        from .models import Category
+
+        with self.lock:
+            version = self.shared_version()
+            # From the primary: a lagging replica would be cached until the next category change
+            names = dict(Category.objects.using(DEFAULT_DB_ALIAS).order_by('id').values_list('id', 'name'))
+            self.names, self.version = names, version
+            self.checked_at = time.monotonic()
+        return names
+
+    def get_names(self):
+        names = self.names
+        if names is None:
+            return self.load()
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            if self.shared_version() != self.version:
+                return self.load()
+            self.checked_at = time.monotonic()
+        return names
+
+    def name_for(self, category_id):
+        if category_id is None:
+            return None
+        names = self.get_names()
+        if category_id not in names:
+            # Created in another worker since our last check
+            names = self.load()
+        return names.get(category_id)
+
+    def as_list(self):
+        return [{'id': pk, 'name': name} for pk, name in self.get_names().items()]
+
+    def invalidate(self):
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.add(self.version_key, 1, timeout=None)
+        self.names = None
+
+
+category_map = CategoryMap()
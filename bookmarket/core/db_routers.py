@@ -0,0 +1,96 @@
+import contextvars
+import hashlib
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# core/db_routers.py
+
+# Replica chosen for the current request, or None to read from the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+def get_option(name, default):
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, default)
+
+
+def pin_key(request):
+    """
+    Cache key identifying the client across requests, taken from what is
+    known before authentication runs: the Authorization header (JWT /
+    Basic) or the session cookie. None for anonymous clients.
+    """
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'db:pin:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def get_cache():
+    return caches[get_option('CACHE_ALIAS', 'default')]
+
+
+def is_pinned(request):
+    key = pin_key(request)
+    return key is not None and bool(get_cache().get(key))
+
+
+def pin(request):
+    """
+    Keep this client on the primary for STICKY_SECONDS (read-your-writes).
+    """
+    key = pin_key(request)
+    if key is not None:
+        get_cache().set(key, 1, timeout=get_option('STICKY_SECONDS', 5))
+
+
+def choose_replica():
+    replicas = get_option('ALIASES', {})
+    if not replicas:
+        return None
+    aliases = list(replicas)
+    return random.choices(aliases, weights=[replicas[alias] for alias in aliases])[0]
+
+
+def activate(alias):
+    """
+    Route this context's reads to `alias` (None: the primary). Returns a
+    token for `deactivate`.
+    """
+    return _read_alias.set(alias)
+
+
+def deactivate(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of read-mostly models (DATABASE_REPLICAS['MODELS']) to a
+    replica during safe-method requests; everything else, and everything
+    outside a request (workers, management commands), uses the primary.
+
+    ReplicaRoutingMiddleware (core/middleware.py) picks one replica per
+    request by weight, so a request reads from a single snapshot, and pins
+    clients to the primary for STICKY_SECONDS after they write
+    (read-your-writes). The pins live in DATABASE_REPLICAS['CACHE_ALIAS'],
+    which must be shared by all workers (see core.cache.check_shared_caches).
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.label not in get_option('MODELS', ()):
+            return None
+        # Inside a transaction on the primary, read what it is about to write
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
@@ -0,0 +1,151 @@
+import datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Book, Order, Transaction
+from .renderers import CSVRenderer, NDJSONRenderer
+
+# core/exports.py
+
+CHUNK_SIZE = 2000
+
+
+class ExportError(Exception):
+    pass
+
+
+# Dataset -> (model, {column: lookup}). Rows come from values(), so no
+# model instances are built and related names come from JOINs.
+DATASETS = {
+    'orders': (Order, {
+        'id': 'id',
+        'created_at': 'created_at',
+        'status': 'status',
+        'book_id': 'book_id',
+        'book_title': 'book__title',
+        'price': 'book__price',
+        'buyer_id': 'buyer_id',
+        'buyer_name': 'buyer__username',
+        'seller_name': 'book__seller__username',
+    }),
+    'transactions': (Transaction, {
+        'id': 'id',
+        'created_at': 'created_at',
+        'status': 'status',
+        'amount': 'amount',
+        'ref_id': 'ref_id',
+        'order_id': 'order_id',
+        'buyer_name': 'order__buyer__username',
+    }),
+    'books': (Book, {
+        'id': 'id',
+        'created_at': 'created_at',
+        'status': 'status',
+        'is_approved': 'is_approved',
+        'title': 'title',
+        'author': 'author',
+        'category_name': 'category__name',
+        'price': 'price',
+        'condition': 'condition',
+        'seller_name': 'seller__username',
+    }),
+}
+
+
+def parse_day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        # Well formed but not a real day, e.g. 2024-13-01
+        day = None
+    if day is None:
+        raise ExportError(f"'{name}' must be a date in YYYY-MM-DD format.")
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def export_queryset(dataset, params):
+    """
+    Build the filtered values() queryset of a dataset from the query
+    parameters: ?start= / ?end= (inclusive days) and ?status= (one or
+    more, comma-separated). Raises ExportError on invalid input.
+    """
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown export '{dataset}'. Choose one of: {', '.join(DATASETS)}.")
+    model, projection = DATASETS[dataset]
+    queryset = model.objects.all()
+
+    # Plain range on the column (rather than created_at__date) so an index can serve it
+    start, end = parse_day(params, 'start'), parse_day(params, 'end')
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    # end=9999-12-31 has no next day, and nothing is later anyway
+    if end is not None and end.date() < datetime.date.max:
+        queryset = queryset.filter(created_at__lt=end + datetime.timedelta(days=1))
+
+    statuses = [value for value in params.get('status', '').split(',') if value]
+    if statuses:
+        valid = {choice for choice, _ in model._meta.get_field('status').choices}
+        unknown = set(statuses) - valid
+        if unknown:
+            raise ExportError(f"Unknown status: {', '.join(sorted(unknown))}.")
+        queryset = queryset.filter(status__in=statuses)
+
+    # values() cannot alias a lookup to a model field's own name; those are selected as-is
+    fields = [name for name, lookup in projection.items() if name == lookup]
+    aliases = {name: F(lookup) for name, lookup in projection.items() if name != lookup}
+    return queryset.order_by('id').values(*fields, **aliases)
+
+
+def chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream(dataset, queryset, fmt):
+    """
+    StreamingHttpResponse writing the queryset as CSV or NDJSON,
+    CHUNK_SIZE rows at a time. Rows are fetched with iterator(), so memory
+    use does not grow with the size of the export.
+    """
+    _, projection = DATASETS[dataset]
+    rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+
+    if fmt == 'ndjson':
+        renderer = NDJSONRenderer()
+
+        def content():
+            for chunk in chunks(rows, CHUNK_SIZE):
+                # Amounts as exact strings, like DecimalField in the API (and the CSV)
+                yield b''.join(
+                    renderer.render_line({
+                        name: str(value) if isinstance(value, Decimal) else value
+                        for name, value in row.items()
+                    })
+                    for row in chunk
+                )
+    else:
+        renderer = CSVRenderer()
+
+        def content():
+            yield renderer.render_rows([], header=list(projection))
+            for chunk in chunks(rows, CHUNK_SIZE):
+                yield renderer.render_rows(chunk, columns=list(projection))
+
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type += f'; charset={renderer.charset}'
+    response = StreamingHttpResponse(content(), content_type=content_type)
+    filename = f'{dataset}-{timezone.localdate().isoformat()}.{renderer.format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
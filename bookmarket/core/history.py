@@ -0,0 +1,66 @@
+from django.http import StreamingHttpResponse
+
+from .models import Order
+from .pagination import CreatedAtCursorPagination
+from .renderers import NDJSONRenderer
+from .serializers import OrderHistorySerializer
+
+# core/history.py
+
+# Section name -> the user's orders in that section
+SECTIONS = {
+    'purchases': lambda user: Order.objects.filter(buyer=user),
+    'sales': lambda user: Order.objects.filter(book__seller=user),
+}
+STREAM_CHUNK_SIZE = 500
+
+
+class HistoryCursorPagination(CreatedAtCursorPagination):
+    """
+    Cursor pagination with one cursor parameter per section
+    (?purchases_cursor=, ?sales_cursor=), so every section pages on its own
+    and the links of one section keep the other section's position.
+    """
+
+    def __init__(self, section):
+        self.cursor_query_param = f'{section}_cursor'
+
+
+def history_queryset(user, section):
+    # One JOIN for the book title and price instead of one query per row
+    return (
+        SECTIONS[section](user)
+        .select_related('book')
+        .only('id', 'status', 'created_at', 'book__title', 'book__price')
+    )
+
+
+def paginate(request, view, user, section):
+    """
+    Return one page of a section as {'next', 'previous', 'results'}.
+    """
+    paginator = HistoryCursorPagination(section)
+    page = paginator.paginate_queryset(history_queryset(user, section), request, view=view)
+    return {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': OrderHistorySerializer(page, many=True).data,
+    }
+
+
+def stream(user, sections):
+    """
+    Stream every order of the given sections as NDJSON, newest first,
+    without holding more than STREAM_CHUNK_SIZE rows in memory. Each line
+    is an OrderHistorySerializer row plus its `section`.
+    """
+    renderer = NDJSONRenderer()
+    serializer = OrderHistorySerializer()
+
+    def lines():
+        for section in sections:
+            orders = history_queryset(user, section).order_by('-created_at', '-id')
+            for order in orders.iterator(chunk_size=STREAM_CHUNK_SIZE):
+                yield renderer.render_line({'section': section, **serializer.to_representation(order)})
+
+    return StreamingHttpResponse(lines(), content_type=renderer.media_type)
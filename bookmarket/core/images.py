@@ -0,0 +1,147 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from .cache import catalogue_cache
+from .models import Book
+
+# core/images.py
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'book_covers/variants'
+# Pillow format -> key / file extension
+FORMATS = (('JPEG', 'jpeg', 'jpg'), ('WEBP', 'webp', 'webp'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sizes():
+    """
+    Variant name -> longest side in pixels.
+    """
+    return getattr(settings, 'BOOK_IMAGE_SIZES', {'thumb': 200, 'medium': 600})
+
+
+def needs_variants(book):
+    return bool(book.image) and book.image_variants.get('source') != book.image.name
+
+
+def render_variants(book):
+    """
+    Write a JPEG and a WebP copy of the cover for every configured size.
+    Returns the image_variants dict describing them.
+    """
+    with book.image.open('rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(book.image.name))[0]
+    sizes = {}
+    for size_name, longest_side in get_sizes().items():
+        resized = original.copy()
+        resized.thumbnail((longest_side, longest_side), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for pil_format, key, extension in FORMATS:
+            frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, quality=82)
+            path = f'{VARIANTS_DIR}/{book.pk}_{stem}_{size_name}.{extension}'
+            variant[key] = default_storage.save(path, ContentFile(buffer.getvalue()))
+        sizes[size_name] = variant
+
+    return {'source': book.image.name, 'sizes': sizes}
+
+
+def stored_names(variants):
+    """
+    The storage names of every file an image_variants dict refers to.
+    """
+    return {
+        variant[key]
+        for variant in variants.get('sizes', {}).values()
+        for _, key, _ in FORMATS
+        if key in variant
+    }
+
+
+def delete_unused_variants(variants):
+    """
+    Delete the files of an image_variants dict unless another book still
+    shows the cover they were made from. ContentHashStorage (core/media.py)
+    names files after their content and variants are rendered from the
+    cover alone, so only books with the same `image` share variant files:
+    one lookup on the indexed image column tells.
+    """
+    source = variants.get('source')
+    if source and Book.objects.filter(image=source).exists():
+        return
+    for name in stored_names(variants):
+        default_storage.delete(name)
+
+
+def generate_variants(book_id, force=False):
+    """
+    Build the variants of one book's cover and store them on the row.
+    Returns True when variants were (re)generated.
+    """
+    book = Book.objects.filter(pk=book_id).only('id', 'image', 'image_variants').first()
+    if book is None or not book.image or not (force or needs_variants(book)):
+        return False
+    variants = render_variants(book)
+    # Only record them if the cover was not replaced in the meantime
+    updated = Book.objects.filter(pk=book_id, image=book.image.name).update(image_variants=variants)
+    if updated:
+        catalogue_cache.invalidate()
+        # The previous cover's variants, unless shared with another book
+        delete_unused_variants(book.image_variants)
+    return bool(updated)
+
+
+def _run(book_id):
+    try:
+        generate_variants(book_id)
+    except Exception:
+        logger.exception("Generating image variants for book %s failed", book_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(book_id):
+    """
+    Hand the book to the background worker pool (BOOK_IMAGE_WORKERS threads).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BOOK_IMAGE_WORKERS', 2),
+                thread_name_prefix='book-images',
+            )
+    return _executor.submit(_run, book_id)
+
+
+def variant_urls(book, request=None):
+    """
+    Size-keyed URLs and dimensions of the cover variants, for the API.
+    """
+    result = {}
+    for size_name, variant in book.image_variants.get('sizes', {}).items():
+        entry = {'width': variant['width'], 'height': variant['height']}
+        for _, key, _ in FORMATS:
+            url = default_storage.url(variant[key])
+            entry[key] = request.build_absolute_uri(url) if request is not None else url
+        result[size_name] = entry
+    return result
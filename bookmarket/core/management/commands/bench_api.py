@@ -0,0 +1,254 @@
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from core.models import Book, Favorite, Notification, Order, User
+from core.serializers import RoleTokenObtainPairSerializer
+
+from .seed_marketplace import WORDS
+
+# name: (method, path, account). '{word}' is replaced by a random search term;
+# checkout POSTs a different available book every time.
+SCENARIOS = {
+    'books': ('GET', '/api/books/', None),
+    'books_filtered': ('GET', '/api/books/?condition=used&min_price=20&max_price=80', None),
+    'books_search': ('GET', '/api/books/?search={word}', None),
+    'checkout': ('POST', '/api/orders/', 'buyer'),
+    'notifications': ('GET', '/api/notifications/', 'buyer'),
+    'admin_reports': ('GET', '/api/admin-reports/', 'admin'),
+    'profile_history': ('GET', '/api/profile/history/', 'buyer'),
+}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, q):
+    """
+    q-th percentile of the sorted list `values`, interpolating between the
+    closest ranks (numpy's default method).
+    """
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples, elapsed):
+    """
+    Turn [(seconds, status), ...] into the per-scenario report.
+    """
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    statuses = Counter(str(status) for _, status in samples)
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    report = {
+        'requests': len(samples),
+        'errors': errors,
+        'status_codes': dict(sorted(statuses.items())),
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'latency_ms': None,
+    }
+    if latencies:
+        report['latency_ms'] = {
+            'min': round(latencies[0], 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            **{f'p{q}': round(percentile(latencies, q), 3) for q in PERCENTILES},
+            'max': round(latencies[-1], 3),
+        }
+    return report
+
+
+class InProcessTransport:
+    """
+    Requests through Django's test client in this process: the whole
+    middleware and view stack, without a web server or sockets.
+    """
+    target = 'in-process'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, token=None, body=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        data = json.dumps(body) if body is not None else ''
+        response = client.generic(method, path, data, content_type='application/json', **headers)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    def close(self):
+        connection.close()
+
+
+class HTTPTransport:
+    """
+    Requests against a running server (`--base-url`), e.g. gunicorn in
+    front of the same database.
+    """
+
+    def __init__(self, base_url):
+        self.target = self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, token=None, body=None):
+        headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+    def close(self):
+        # The worker threads also read the checkout pool from the database
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the key API endpoints concurrently against a dataset created by "
+        "`seed_marketplace` and report p50/p95/p99 latency and requests per second "
+        "per scenario as JSON, to diff between releases. Runs in-process by default, "
+        "or against a live server with --base-url. The checkout scenario really buys "
+        "books, so run it against a scratch copy of the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients.")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per scenario.")
+        parser.add_argument('--accounts', type=int, default=50, help="Seeded buyers to spread requests over.")
+        parser.add_argument('--prefix', default='seed_', help="Username prefix given to seed_marketplace.")
+        parser.add_argument('--base-url', help="Benchmark a running server instead, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--label', default='', help="Free text stored in the report (release, commit).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Sold-out checkouts and permission errors are counted, not logged
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        prefix = options['prefix']
+        self.rng = random.Random(options['random_seed'])
+        self.transport = HTTPTransport(options['base_url']) if options['base_url'] else InProcessTransport()
+
+        buyers = list(User.objects.filter(username__startswith=f'{prefix}buyer_').order_by('id')[:options['accounts']])
+        admin = User.objects.filter(username=f'{prefix}admin').first()
+        if not buyers or admin is None:
+            raise CommandError(f"No '{prefix}*' accounts found; run `manage.py seed_marketplace` first.")
+        self.accounts = {'buyer': buyers, 'admin': [admin]}
+
+        checkouts = (options['warmup'] + options['requests']) * ('checkout' in options['scenarios'])
+        self.available = deque(
+            Book.objects.filter(is_approved=True, status='available', seller__username__startswith=prefix)
+            .order_by('?').values_list('id', flat=True)[:checkouts]
+        )
+        if len(self.available) < checkouts:
+            self.stderr.write(f"Only {len(self.available)} available books: the remaining checkouts will fail.")
+
+        report = {
+            'label': options['label'],
+            'target': self.transport.target,
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'concurrency': options['concurrency'],
+            'requests_per_scenario': options['requests'],
+            'dataset': {
+                'users': User.objects.count(),
+                'books': Book.objects.count(),
+                'orders': Order.objects.count(),
+                'favorites': Favorite.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            'scenarios': {},
+        }
+        for name in options['scenarios']:
+            self.tokens = {
+                role: [str(RoleTokenObtainPairSerializer.get_token(user).access_token) for user in users]
+                for role, users in self.accounts.items()
+            }
+            self.run(name, options['warmup'], options['concurrency'])
+            samples, elapsed = self.run(name, options['requests'], options['concurrency'])
+            method, path, _ = SCENARIOS[name]
+            report['scenarios'][name] = {'method': method, 'path': path, **summarize(samples, elapsed)}
+
+        output = json.dumps(report, indent=2)
+        if not options['output']:
+            self.stdout.write(output)
+            return
+        with open(options['output'], 'w') as f:
+            f.write(output + '\n')
+        self.stdout.write(f"{'scenario':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name, result in report['scenarios'].items():
+            latency = result['latency_ms'] or {}
+            self.stdout.write(
+                f"{name:<16} {result['rps'] or 0:8.1f} {latency.get('p50', 0):8.2f} "
+                f"{latency.get('p95', 0):8.2f} {latency.get('p99', 0):8.2f} {result['errors']:7d}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def request_args(self, name, rng):
+        method, path, account = SCENARIOS[name]
+        token = rng.choice(self.tokens[account]) if account else None
+        body = None
+        if name == 'checkout':
+            try:
+                book_id = self.available.pop()
+            except IndexError:
+                book_id = 0
+            body = {'book': book_id}
+        return method, path.format(word=rng.choice(WORDS)), token, body
+
+    def run(self, name, total, concurrency):
+        """
+        Send `total` requests of scenario `name` from `concurrency` threads.
+        Returns ([(seconds, status), ...], elapsed seconds).
+        """
+        samples = []
+        lock = threading.Lock()
+        remaining = iter(range(total))
+        seeds = [self.rng.random() for _ in range(concurrency)]
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = []
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            break
+                    args = self.request_args(name, rng)
+                    started = time.perf_counter()
+                    try:
+                        status = self.transport.request(*args)
+                    except Exception as exc:
+                        status = type(exc).__name__
+                    local.append((time.perf_counter() - started, status))
+            finally:
+                self.transport.close()
+                with lock:
+                    samples.extend(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in seeds]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
@@ -0,0 +1,119 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from bookmarket.db_profiles import PROFILES, sqlite_database
+from core.models import Book, Notification, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Read/write mix benchmark for the SQLite profiles in bookmarket/db_profiles.py. "
+        "Each profile gets its own scratch database file; worker threads run catalogue "
+        "reads and small write transactions for a fixed time, closing the connection "
+        "after every simulated request the way Django does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['legacy', 'production'], choices=list(PROFILES))
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent workers.")
+        parser.add_argument('--seconds', type=float, default=5, help="Duration per profile.")
+        parser.add_argument('--write-ratio', type=float, default=0.2, help="Share of requests that write.")
+        parser.add_argument('--books', type=int, default=2000, help="Books in the scratch database.")
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='bench_db_')
+        template = os.path.join(workdir, 'template.sqlite3')
+        try:
+            self.build_template(template, options['books'])
+            results = {}
+            for profile in options['profiles']:
+                path = os.path.join(workdir, f'{profile}.sqlite3')
+                shutil.copyfile(template, path)
+                results[profile] = self.run_profile(profile, path, options)
+
+            self.stdout.write(f"{'profile':<12} {'req/s':>8} {'reads/s':>8} {'writes/s':>9} {'locked':>7}")
+            for profile, result in results.items():
+                elapsed = result['elapsed']
+                self.stdout.write(
+                    f"{profile:<12} {(result['read'] + result['write']) / elapsed:8.1f} "
+                    f"{result['read'] / elapsed:8.1f} {result['write'] / elapsed:9.1f} {result['locked']:7d}"
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def register(self, alias, path, profile):
+        connections.settings[alias] = {**connections.settings['default'], **sqlite_database(path, profile)}
+        connections.settings[alias]['TEST'] = {}
+        connections.settings[alias].pop('MIRROR', None)
+
+    def build_template(self, path, books):
+        alias = 'bench_template'
+        self.register(alias, path, 'development')
+        call_command('migrate', database=alias, verbosity=0)
+        # bulk_create / update() only: model signals would write to the default database
+        seller, = User.objects.using(alias).bulk_create([User(username='bench_seller', role='seller')])
+        Book.objects.using(alias).bulk_create([
+            Book(title=f'Bench book {i}', author='Bench', price=10, condition='used',
+                 description='benchmark', seller=seller, is_approved=True, status='available')
+            for i in range(books)
+        ])
+        # Leave a plain rollback-journal file behind; each profile sets its own mode
+        with connections[alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=DELETE')
+        connections[alias].close()
+
+    def run_profile(self, profile, path, options):
+        alias = f'bench_{profile}'
+        self.register(alias, path, profile)
+        seller_id = User.objects.using(alias).get(username='bench_seller').id
+        book_ids = list(Book.objects.using(alias).values_list('id', flat=True))
+        connections[alias].close()
+
+        counts = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        write_ratio = options['write_ratio']
+
+        def worker():
+            local = Counter()
+            rng = random.Random()
+            try:
+                while time.perf_counter() < deadline:
+                    try:
+                        if rng.random() < write_ratio:
+                            # Read, then write in the same transaction (like the outbox drain
+                            # or an order): the pattern that fails with "database is locked"
+                            # when two deferred transactions try to upgrade their read locks
+                            with transaction.atomic(using=alias):
+                                book = Book.objects.using(alias).only('id', 'price').get(id=rng.choice(book_ids))
+                                Book.objects.using(alias).filter(id=book.id).update(price=book.price + 1)
+                                Notification.objects.using(alias).create(user_id=seller_id, message='bench')
+                            local['write'] += 1
+                        else:
+                            list(Book.objects.using(alias).filter(is_approved=True).order_by('-created_at')[:20])
+                            local['read'] += 1
+                    except OperationalError:
+                        local['locked'] += 1
+                    # End of a simulated request (what request_finished does)
+                    connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+                with lock:
+                    counts.update(local)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {'elapsed': time.perf_counter() - started, **{key: counts[key] for key in ('read', 'write', 'locked')}}
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from core.models import Book, Order, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the purchase path: fires N parallel buyers at "
+        "the same book, repeated for several books, and reports throughput and "
+        "oversold books. Creates its own bench_* users and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=8, help="Parallel buyers per book.")
+        parser.add_argument('--books', type=int, default=20, help="Number of books to fight over.")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark data.")
+
+    def handle(self, *args, **options):
+        # Every losing buyer gets a 400; don't log each one
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        buyers_count, books_count = options['buyers'], options['books']
+        seller = User.objects.create_user('bench_seller', password='bench', role='seller')
+        buyers = [User.objects.create_user(f'bench_buyer_{i}', password='bench') for i in range(buyers_count)]
+        books = [
+            Book.objects.create(
+                title=f'Bench book {i}', author='Bench', price=10, condition='used',
+                description='benchmark', seller=seller, is_approved=True,
+            )
+            for i in range(books_count)
+        ]
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def buy(buyer, book, barrier):
+            client = APIClient(HTTP_HOST='localhost')
+            client.force_authenticate(buyer)
+            barrier.wait()
+            try:
+                response = client.post('/api/orders/', {'book': book.id})
+                result = 'purchased' if response.status_code == 201 else f'rejected_{response.status_code}'
+            except Exception as exc:
+                result = f'error_{type(exc).__name__}'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[result] += 1
+
+        started = time.perf_counter()
+        try:
+            for book in books:
+                barrier = threading.Barrier(buyers_count)
+                threads = [threading.Thread(target=buy, args=(buyer, book, barrier)) for buyer in buyers]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+
+            orders_per_book = Counter(Order.objects.filter(book__in=books).values_list('book_id', flat=True))
+            oversold = sum(count - 1 for count in orders_per_book.values() if count > 1)
+            requests = buyers_count * books_count
+
+            self.stdout.write(f"Buyers per book:   {buyers_count}")
+            self.stdout.write(f"Books:             {books_count}")
+            self.stdout.write(f"Requests:          {requests}")
+            for result, count in sorted(outcomes.items()):
+                self.stdout.write(f"  {result:<16} {count}")
+            self.stdout.write(f"Elapsed:           {elapsed:.2f}s")
+            self.stdout.write(f"Throughput:        {requests / elapsed:.1f} req/s")
+            style = self.style.SUCCESS if oversold == 0 else self.style.ERROR
+            self.stdout.write(style(f"Oversold books:    {oversold}"))
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith='bench_').delete()
@@ -0,0 +1,87 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Book
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+from core.serializers import BookSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Render benchmark: times JSONRenderer against ORJSONRenderer on a page of "
+        "serialized books and on raw values() rows (Decimal, datetime), and checks "
+        "that both produce identical bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Rows per payload.")
+        parser.add_argument('--iterations', type=int, default=500, help="Renders per renderer and payload.")
+
+    def handle(self, *args, **options):
+        rows, iterations = options['rows'], options['iterations']
+        payloads = {
+            'books page': self.book_page(rows),
+            'values() rows': self.value_rows(rows),
+        }
+        stock, fast = JSONRenderer(), ORJSONRenderer()
+
+        for name, data in payloads.items():
+            expected = stock.render(data)
+            rendered = fast.render(data)
+            timings = {
+                renderer_name: self.time_it(renderer.render, data, iterations)
+                for renderer_name, renderer in (('json', stock), ('orjson', fast))
+            }
+            self.stdout.write(f"{name} ({len(expected)} bytes, {iterations} renders)")
+            for renderer_name, elapsed in timings.items():
+                self.stdout.write(f"  {renderer_name:<8} {elapsed * 1000 / iterations:8.3f} ms/render")
+            self.stdout.write(f"  speedup  {timings['json'] / timings['orjson']:8.1f}x")
+            if rendered == expected:
+                self.stdout.write(self.style.SUCCESS("  output   identical"))
+            else:
+                self.stdout.write(self.style.ERROR("  output   DIFFERS"))
+
+            parse_time = self.time_it(lambda body: ORJSONParser().parse(_Stream(body)), expected, iterations)
+            self.stdout.write(f"  parse    {parse_time * 1000 / iterations:8.3f} ms/parse (orjson)")
+
+    def time_it(self, func, data, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func(data)
+        return time.perf_counter() - started
+
+    def book_page(self, rows):
+        books = list(Book.objects.select_related('seller')[:rows])
+        if len(books) < rows:
+            # Not enough books in this database: serialize unsaved ones
+            now = timezone.now()
+            books += [
+                Book(
+                    id=100000 + i, title=f'Bench book {i} — «جلد اول»', author='Bench',
+                    price=Decimal('12.50') + i, condition='used', description='benchmark line',
+                    status='available', is_approved=True, created_at=now - timedelta(minutes=i),
+                )
+                for i in range(rows - len(books))
+            ]
+        return {'next': None, 'previous': None, 'results': BookSerializer(books, many=True).data}
+
+    def value_rows(self, rows):
+        now = timezone.now()
+        return [
+            {'id': i, 'title': f'Book {i}', 'price': Decimal('10.25') * i, 'created_at': now - timedelta(hours=i)}
+            for i in range(rows)
+        ]
+
+
+class _Stream:
+    def __init__(self, body):
+        self.body = body
+
+    def read(self):
+        return self.body
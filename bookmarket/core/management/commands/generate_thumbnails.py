@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.images import generate_variants
+from core.models import Book
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnail/WebP variants for existing book covers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of worker threads.")
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist.")
+
+    def handle(self, *args, **options):
+        book_ids = list(Book.objects.exclude(image='').exclude(image__isnull=True).values_list('id', flat=True))
+        force = options['force']
+        done = failed = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {pool.submit(self.process, book_id, force): book_id for book_id in book_ids}
+            for future in as_completed(futures):
+                try:
+                    done += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"Book {futures[future]}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated variants for {done} of {len(book_ids)} covers ({failed} failed)."
+        ))
+
+    def process(self, book_id, force):
+        try:
+            return generate_variants(book_id, force=force)
+        finally:
+            connection.close()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of worker threads.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Outbox rows per transaction.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain what is due and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            delivered = drain(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} outbox rows."))
+            return
+
+        threads = [
+            threading.Thread(target=self.work, args=(options['batch_size'], options['interval']), daemon=True)
+            for _ in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Outbox worker pool started with {len(threads)} thread(s). Press Ctrl+C to stop.")
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping outbox workers.")
+
+    def work(self, batch_size, interval):
+        try:
+            while True:
+                close_old_connections()
+                if not drain(batch_size):
+                    time.sleep(interval)
+        finally:
+            connection.close()
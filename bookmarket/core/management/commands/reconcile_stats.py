@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the SiteStats counters from the source tables (run periodically, e.g. from cron)."
+
+    def handle(self, *args, **options):
+        stats = reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stats reconciled: {stats.active_users} active users, {stats.total_books} books, "
+            f"{stats.total_orders} orders, revenue {stats.revenue}"
+        ))
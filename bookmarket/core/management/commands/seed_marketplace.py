@@ -0,0 +1,180 @@
+import random
+import time
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import stats
+from core.cache import catalogue_cache, category_map
+from core.models import Book, Category, Favorite, Notification, Order, Transaction, User
+
+WORDS = (
+    'python', 'django', 'history', 'physics', 'poetry', 'algebra', 'chemistry', 'design',
+    'network', 'garden', 'ocean', 'economics', 'music', 'novel', 'database', 'biology',
+)
+NOTIFICATION_MESSAGES = (
+    'Your order has been paid.',
+    'A book on your wishlist is available.',
+    'Your book has been approved.',
+    'Your support ticket received a reply.',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic marketplace for load testing: users, sellers, "
+        "categories, books, paid orders with their transactions, favorites and notifications. "
+        "Rows are written with batched bulk_create, so millions of rows take minutes; "
+        "`--scale` multiplies every count. Usernames start with --prefix (the accounts "
+        "`bench_api` logs in with), so several datasets can live side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1, help="Multiply every count below.")
+        parser.add_argument('--buyers', type=int, default=1000)
+        parser.add_argument('--sellers', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=4000, help="Paid orders (one per sold book).")
+        parser.add_argument('--favorites', type=int, default=10000)
+        parser.add_argument('--notifications', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT transaction.")
+        parser.add_argument('--prefix', default='seed_', help="Prefix of the generated usernames.")
+        parser.add_argument('--password', default='bench', help="Password of every generated user.")
+        parser.add_argument('--random-seed', type=int, default=0, help="Seed for reproducible datasets.")
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        counts = {
+            name: max(int(options[name] * scale), 1)
+            for name in ('buyers', 'sellers', 'categories', 'books', 'orders', 'favorites', 'notifications')
+        }
+        # Every order sells one book, every favorite is a distinct (buyer, book) pair
+        counts['orders'] = min(counts['orders'], counts['books'])
+        counts['favorites'] = min(counts['favorites'], counts['buyers'] * counts['books'])
+
+        self.prefix = options['prefix']
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(f"Users named '{self.prefix}*' already exist; pick another --prefix.")
+
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['random_seed'])
+        # Hashing is the slowest part of creating a user: hash once, share it
+        self.password = make_password(options['password'])
+        self.rows = 0
+        started = time.perf_counter()
+
+        buyer_ids = self.create_users('buyer', counts['buyers'])
+        seller_ids = self.create_users('seller', counts['sellers'])
+        self.create_admin()
+        category_ids = self.insert(Category, (
+            Category(name=f'{self.prefix}{WORDS[i % len(WORDS)]} {i}') for i in range(counts['categories'])
+        ))
+        book_ids, sold_prices = self.create_books(counts['books'], counts['orders'], seller_ids, category_ids)
+        self.create_orders(book_ids[:counts['orders']], sold_prices, buyer_ids)
+        self.create_favorites(counts['favorites'], buyer_ids, book_ids)
+        rng = self.rng
+        self.insert(Notification, (
+            Notification(user_id=rng.choice(buyer_ids), message=rng.choice(NOTIFICATION_MESSAGES), is_read=rng.random() < 0.7)
+            for _ in range(counts['notifications'])
+        ))
+
+        # bulk_create bypasses the signals that keep these up to date
+        stats.reconcile()
+        catalogue_cache.invalidate()
+        category_map.invalidate()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {self.rows} rows in {elapsed:.1f}s ({self.rows / elapsed:.0f} rows/s)."
+        ))
+        self.stdout.write(f"Log in as {self.prefix}buyer_0 / {self.prefix}seller_0 / {self.prefix}admin.")
+
+    def insert(self, model, objects):
+        """
+        bulk_create `objects` (any iterable) in batches of --batch-size,
+        one transaction per batch, and return the new primary keys.
+        """
+        ids = []
+        objects = iter(objects)
+        while batch := list(islice(objects, self.batch_size)):
+            with transaction.atomic():
+                ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+            self.rows += len(batch)
+            self.stdout.write(f"  {model._meta.db_table}: {len(ids)}", ending='\r')
+            self.stdout.flush()
+        self.stdout.write(f"  {model._meta.db_table}: {len(ids)}")
+        return ids
+
+    def create_users(self, role, count):
+        return self.insert(User, (
+            User(
+                username=f'{self.prefix}{role}_{i}', email=f'{self.prefix}{role}_{i}@example.com',
+                password=self.password, role=role,
+            )
+            for i in range(count)
+        ))
+
+    def create_admin(self):
+        self.insert(User, [User(
+            username=f'{self.prefix}admin', email=f'{self.prefix}admin@example.com',
+            password=self.password, role='admin', is_staff=True,
+        )])
+
+    def create_books(self, count, sold, seller_ids, category_ids):
+        """
+        The first `sold` books are approved and sold (create_orders buys
+        them); the rest are a mix of available and pending review.
+        Returns the book ids and the prices of the sold books.
+        """
+        rng = self.rng
+        sold_prices = []
+
+        def books():
+            for i in range(count):
+                price = Decimal(rng.randrange(500, 20000)) / 100
+                if i < sold:
+                    approved, book_status = True, 'sold'
+                    sold_prices.append(price)
+                else:
+                    approved = rng.random() < 0.85
+                    book_status = 'available' if approved else 'pending'
+                yield Book(
+                    title=f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}',
+                    author=f'Author {rng.randrange(count // 10 + 1)}',
+                    category_id=rng.choice(category_ids),
+                    price=price,
+                    condition=rng.choice(('new', 'used')),
+                    description=' '.join(rng.choices(WORDS, k=12)),
+                    seller_id=rng.choice(seller_ids),
+                    is_approved=approved,
+                    status=book_status,
+                )
+
+        return self.insert(Book, books()), sold_prices
+
+    def create_orders(self, book_ids, prices, buyer_ids):
+        rng = self.rng
+        order_ids = self.insert(Order, (
+            Order(book_id=book_id, buyer_id=rng.choice(buyer_ids), status='paid') for book_id in book_ids
+        ))
+        self.insert(Transaction, (
+            Transaction(order_id=order_id, amount=price, ref_id=f'{self.prefix}{order_id}', status='success')
+            for order_id, price in zip(order_ids, prices)
+        ))
+
+    def create_favorites(self, count, buyer_ids, book_ids):
+        # Each buyer favorites a run of consecutive books from a random
+        # start, so pairs are unique without remembering them all
+        per_buyer, extra = divmod(count, len(buyer_ids))
+
+        def favorites():
+            for index, buyer_id in enumerate(buyer_ids):
+                start = self.rng.randrange(len(book_ids))
+                for offset in range(per_buyer + (index < extra)):
+                    yield Favorite(user_id=buyer_id, book_id=book_ids[(start + offset) % len(book_ids)])
+
+        self.insert(Favorite, favorites())
@@ -0,0 +1,198 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# core/media.py
+
+HASH_LENGTH = 16
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{%d}\.[A-Za-z0-9]+$' % HASH_LENGTH)
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def get_option(name, default):
+    return getattr(settings, 'MEDIA_SERVING', {}).get(name, default)
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    File storage that names every upload after the SHA-256 of its content
+    (`book_covers/3f2a9c0d41b7e8aa.jpg`). Identical files are written once
+    and share one name, and since a name can never point at different bytes,
+    those files can be cached by browsers forever.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        digest = hashlib.sha256()
+        # chunks() rewinds the file first
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+
+        extension = os.path.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), digest.hexdigest()[:HASH_LENGTH] + extension)
+        if self.exists(name):
+            # Already stored by an earlier upload of the same file
+            return name
+        return super().save(name, content, max_length)
+
+
+def is_immutable(name):
+    return bool(HASHED_NAME_RE.match(posixpath.basename(name)))
+
+
+def make_etag(name, stat):
+    if is_immutable(name):
+        # The name is the content hash
+        return '"%s"' % posixpath.basename(name).split('.')[0]
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def etag_matches(header, etag):
+    if header is None:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison: compression turns "x" into W/"x"
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) for a single `bytes=` range, None when the header
+    should be ignored (missing, malformed, last byte before the first, or
+    several ranges) and False when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        # An empty file has no last bytes to send
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Syntactically invalid (RFC 9110 14.1.1): serve the whole file
+        return None
+    if start >= size:
+        return False
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators and caching headers.
+
+    Answers If-None-Match / If-Modified-Since with 304 and single byte
+    ranges with 206. Content-hashed names get a one-year immutable
+    Cache-Control; anything else is revalidated after MEDIA_SERVING['MAX_AGE'].
+    With MEDIA_SERVING['OFFLOAD'] set to 'x-sendfile' or 'x-accel-redirect',
+    only the headers are built here and the web server sends the bytes.
+    """
+    # 1. Resolve the file, refusing anything outside MEDIA_ROOT
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        raise Http404("File not found.")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    # 2. Validators and caching headers shared by every response
+    etag = make_etag(path, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+    if is_immutable(path):
+        headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        headers['Cache-Control'] = 'public, max-age=%d' % get_option('MAX_AGE', 3600)
+
+    # 3. Conditional GET (If-None-Match wins over If-Modified-Since)
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        not_modified = since is not None and int(stat.st_mtime) <= since
+    if not_modified:
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    # 4. Hand the transfer to the web server
+    offload = get_option('OFFLOAD', None)
+    if offload:
+        response = HttpResponse(content_type=content_type)
+        if offload == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = get_option('ACCEL_PREFIX', '/protected-media/') + path
+        else:
+            response['X-Sendfile'] = full_path
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    # 5. Byte ranges; If-Range only allows them while the file is unchanged
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range is not None and if_range.strip() != etag:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%d' % stat.st_size
+        return response
+
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(read_range(full_path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, stat.st_size)
+        response['Content-Length'] = str(length)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for name, value in headers.items():
+        response[name] = value
+    return response
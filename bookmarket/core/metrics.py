@@ -0,0 +1,222 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+# core/metrics.py
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'bookmarket_'
+
+# metric name -> (HELP text, METRICS option holding its buckets, default buckets)
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time spent handling the request, by route.',
+        'LATENCY_BUCKETS', (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'http_db_queries': (
+        'Database queries executed per request, by route.',
+        'QUERY_BUCKETS', (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'http_response_size_bytes': (
+        'Response body size in bytes (after compression), by route.',
+        'SIZE_BUCKETS', (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+RESPONSES = 'http_responses_total'
+# Any other request method is recorded as 'other', so clients cannot add labels
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+
+def get_option(name, default):
+    return getattr(settings, 'METRICS', {}).get(name, default)
+
+
+def get_buckets(metric):
+    _, option, default = HISTOGRAMS[metric]
+    return tuple(get_option(option, default))
+
+
+def route_name(request):
+    """
+    The resolved URL name ('book-list', 'order-pay', 'admin-reports'), so
+    the label set stays bounded whatever paths clients request.
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+def method_name(request):
+    return request.method if request.method in METHODS else 'other'
+
+
+class Registry:
+    """
+    In-process aggregates of the request metrics: one histogram (bucket
+    counts plus the sum) per (metric, route, method) and a response counter
+    per (route, method, status).
+
+    In multiprocess mode (METRICS['MULTIPROCESS_DIR'], for pre-forked
+    workers) every process also writes its aggregates to its own file in
+    that directory, at most every FLUSH_INTERVAL seconds and at exit, and
+    `collect` adds up the files of all processes. The directory should be
+    emptied before the server starts.
+    """
+
+    def __init__(self):
+        self.reset()
+        # A forked worker starts from zero rather than the parent's counts
+        os.register_at_fork(after_in_child=self.reset)
+        atexit.register(self.flush)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.responses = Counter()
+        self.flushed_at = time.monotonic()
+
+    def record(self, route, method, status, seconds, queries, size):
+        observations = (
+            ('http_request_duration_seconds', seconds),
+            ('http_db_queries', queries),
+            ('http_response_size_bytes', size),
+        )
+        with self.lock:
+            for metric, value in observations:
+                buckets = get_buckets(metric)
+                key = (metric, route, method)
+                values = self.histograms.get(key)
+                if values is None:
+                    # One count per bucket, then +Inf, then the sum
+                    values = self.histograms[key] = [0] * (len(buckets) + 2)
+                values[bisect.bisect_left(buckets, value)] += 1
+                values[-1] += value
+            self.responses[(route, method, str(status))] += 1
+
+        if get_option('MULTIPROCESS_DIR', None) and time.monotonic() - self.flushed_at >= get_option('FLUSH_INTERVAL', 1):
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                [[*key, list(values)] for key, values in self.histograms.items()],
+                [[*key, count] for key, count in self.responses.items()],
+            )
+
+    def path(self):
+        return os.path.join(get_option('MULTIPROCESS_DIR', None), f'metrics-{os.getpid()}.json')
+
+    def flush(self):
+        """
+        Write this process's aggregates to its file (multiprocess mode only).
+        """
+        if not get_option('MULTIPROCESS_DIR', None):
+            return
+        self.flushed_at = time.monotonic()
+        histograms, responses = self.snapshot()
+        if not histograms:
+            return
+        path = self.path()
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'histograms': histograms, 'responses': responses}, f)
+        # Readers see either the previous file or the new one, never half of it
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """
+        Return ({(metric, route, method): values}, {(route, method, status): count})
+        for this process, or for every process in multiprocess mode.
+        """
+        directory = get_option('MULTIPROCESS_DIR', None)
+        if not directory:
+            histograms, responses = self.snapshot()
+            snapshots = [{'histograms': histograms, 'responses': responses}]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    # Removed or replaced while reading
+                    continue
+
+        histograms, responses = {}, Counter()
+        for snapshot in snapshots:
+            for *key, values in snapshot['histograms']:
+                total = histograms.setdefault(tuple(key), [0] * len(values))
+                if len(total) == len(values):
+                    for index, value in enumerate(values):
+                        total[index] += value
+            for *key, count in snapshot['responses']:
+                responses[tuple(key)] += count
+        return histograms, responses
+
+
+registry = Registry()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in values.items()) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(histograms, responses):
+    """
+    Prometheus text exposition format (version 0.0.4).
+    """
+    lines = []
+    for metric, (help_text, _, _) in HISTOGRAMS.items():
+        name = PREFIX + metric
+        buckets = get_buckets(metric)
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (key_metric, route, method), values in sorted(histograms.items()):
+            if key_metric != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{labels(route=route, method=method, le=bound)} {cumulative}')
+            lines.append(f'{name}_sum{labels(route=route, method=method)} {format_value(values[-1])}')
+            lines.append(f'{name}_count{labels(route=route, method=method)} {cumulative}')
+
+    name = PREFIX + RESPONSES
+    lines += [f'# HELP {name} Responses sent, by route and status code.', f'# TYPE {name} counter']
+    for (route, method, code), count in sorted(responses.items()):
+        lines.append(f'{name}{labels(route=route, method=method, status=code)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+@require_safe
+def metrics_view(request):
+    """
+    The request metrics for a Prometheus scraper, which sends
+    METRICS['TOKEN'] as `Authorization: Bearer <token>`. Staff users with a
+    session may read them too; METRICS['PUBLIC'] opens them to everybody.
+    """
+    token = get_option('TOKEN', None)
+    allowed = (
+        get_option('PUBLIC', False)
+        or (token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'))
+        or getattr(getattr(request, 'user', None), 'is_staff', False)
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(*registry.collect()), content_type=CONTENT_TYPE)
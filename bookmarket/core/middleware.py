@@ -0,0 +1,306 @@
+import re
+import time
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+from . import db_routers, metrics
+from .querybudget import RequestQueryCounter
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# core/middleware.py
+
+# No text/html: pages carrying a CSRF token next to reflected input are
+# open to BREACH when compressed. The API responses below carry neither.
+COMPRESSIBLE_TYPES = (
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/json',
+    'application/x-ndjson',
+    'application/ndjson',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ACCEPT_ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def get_option(name, default):
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, default)
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+# Content-Encoding token -> (encoder, default level, available)
+ENCODERS = {
+    'br': (BrotliEncoder, 5, brotli is not None),
+    'zstd': (ZstdEncoder, 3, zstandard is not None),
+    'gzip': (GzipEncoder, 6, True),
+}
+
+
+def parse_accept_encoding(header):
+    """
+    Return {coding: q} from an Accept-Encoding header.
+    """
+    accepted = {}
+    for part in header.split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(part)
+        if not match:
+            continue
+        try:
+            accepted[match.group(1).lower()] = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best coding the client accepts
+    (Accept-Encoding q-values, ties broken by RESPONSE_COMPRESSION
+    ['PREFERENCE']): Brotli and Zstandard when their packages are
+    installed, gzip always.
+
+    Only the textual content types in COMPRESSIBLE_TYPES are compressed,
+    so covers and other already-compressed media pass through untouched, as
+    do HTML pages (BREACH), responses that already carry a Content-Encoding
+    and partial (206) responses. Regular responses smaller than MIN_SIZE
+    bytes are left alone. Streaming responses (NDJSON exports, history
+    streams) are compressed as they go and flushed once FLUSH_SIZE bytes
+    have been fed in or FLUSH_INTERVAL seconds have passed since the last
+    flush, so clients still receive rows promptly without one sync-flush
+    per row ruining the ratio.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = get_option('MIN_SIZE', 512)
+        self.flush_size = get_option('FLUSH_SIZE', 16 * 1024)
+        self.flush_interval = get_option('FLUSH_INTERVAL', 0.5)
+        levels = get_option('LEVELS', {})
+        self.encoders = {
+            coding: (encoder, levels.get(coding, level))
+            for coding, (encoder, level, available) in ENCODERS.items()
+            if available
+        }
+        self.preference = [
+            coding for coding in get_option('PREFERENCE', ('br', 'zstd', 'gzip')) if coding in self.encoders
+        ]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        # The body now depends on Accept-Encoding, whether or not this client gets it compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = self.choose_coding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        encoder_class, level = self.encoders[coding]
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(response.streaming_content, encoder_class(level))
+            else:
+                response.streaming_content = self.compress_stream(response.streaming_content, encoder_class(level))
+            del response.headers['Content-Length']
+        else:
+            encoder = encoder_class(level)
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed bytes differ from the ones a strong ETag was computed for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    def is_compressible(self, response):
+        if response.status_code == 206 or response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type.startswith(get_option('TYPES', COMPRESSIBLE_TYPES))
+
+    def choose_coding(self, header):
+        accepted = parse_accept_encoding(header)
+        wildcard = accepted.get('*', 0)
+        best, best_q = None, 0
+        for coding in self.preference:
+            q = accepted.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def compress_stream(self, chunks, encoder):
+        buffered, flushed_at = 0, time.monotonic()
+        for chunk in chunks:
+            data = encoder.compress(chunk)
+            buffered += len(chunk)
+            if buffered >= self.flush_size or time.monotonic() - flushed_at >= self.flush_interval:
+                data += encoder.flush()
+                buffered, flushed_at = 0, time.monotonic()
+            if data:
+                yield data
+        yield encoder.finish()
+
+    async def compress_async(self, chunks, encoder):
+        buffered, flushed_at = 0, time.monotonic()
+        async for chunk in chunks:
+            data = encoder.compress(chunk)
+            buffered += len(chunk)
+            if buffered >= self.flush_size or time.monotonic() - flushed_at >= self.flush_interval:
+                data += encoder.flush()
+                buffered, flushed_at = 0, time.monotonic()
+            if data:
+                yield data
+        yield encoder.finish()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ReplicaRouter (core/db_routers.py) read from a replica during
+    safe-method requests, unless the client wrote something within the last
+    DATABASE_REPLICAS['STICKY_SECONDS']. A successful write pins the client
+    to the primary for that long.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        alias = db_routers.choose_replica() if safe and not db_routers.is_pinned(request) else None
+
+        token = db_routers.activate(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_routers.deactivate(token)
+
+        if not safe and response.status_code < 400:
+            db_routers.pin(request)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status code, database queries and response size of
+    every request under its route name in core/metrics.py (served at
+    /metrics). Placed first, so the latency includes the other middleware
+    and the size is the compressed one. Streaming responses are recorded
+    once their last chunk has been sent, except files, which keep their
+    sendfile path and are recorded with their Content-Length.
+    """
+
+    def __init__(self, get_response):
+        if not metrics.get_option('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = RequestQueryCounter()
+        started = time.perf_counter()
+        counter.install()
+        try:
+            response = self.get_response(request)
+        finally:
+            counter.uninstall()
+
+        def record(size):
+            metrics.registry.record(
+                metrics.route_name(request), metrics.method_name(request), response.status_code,
+                time.perf_counter() - started, counter.count, size,
+            )
+
+        if not response.streaming:
+            record(len(response.content))
+        elif isinstance(response, FileResponse):
+            record(int(response.get('Content-Length') or 0))
+        elif response.is_async:
+            response.streaming_content = self.measure_async(response.streaming_content, counter, record)
+        else:
+            response.streaming_content = self.measure_stream(response.streaming_content, counter, record)
+        return response
+
+    def measure_stream(self, chunks, counter, record):
+        size = 0
+        counter.install()
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            counter.uninstall()
+            record(size)
+
+    async def measure_async(self, chunks, counter, record):
+        size = 0
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            record(size)
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# FTS5 index for Book.title / Book.author, kept in sync by triggers.
+# Only created on SQLite; other backends fall back to BasicSearchBackend.
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_book_fts USING fts5(
+        title, author,
+        content='core_book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_book_fts_ai AFTER INSERT ON core_book BEGIN
+        INSERT INTO core_book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_book_fts_ad AFTER DELETE ON core_book BEGIN
+        INSERT INTO core_book_fts(core_book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_book_fts_au AFTER UPDATE OF title, author ON core_book BEGIN
+        INSERT INTO core_book_fts(core_book_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO core_book_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    "INSERT INTO core_book_fts(core_book_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS core_book_fts_au",
+    "DROP TRIGGER IF EXISTS core_book_fts_ad",
+    "DROP TRIGGER IF EXISTS core_book_fts_ai",
+    "DROP TABLE IF EXISTS core_book_fts",
+]
+
+
+def run_statements(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_statements(CREATE_SQL), run_statements(DROP_SQL)),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def seed_stats(apps, schema_editor):
+    User = apps.get_model("core", "User")
+    Book = apps.get_model("core", "Book")
+    Order = apps.get_model("core", "Order")
+    Transaction = apps.get_model("core", "Transaction")
+    SiteStats = apps.get_model("core", "SiteStats")
+    db = schema_editor.connection.alias
+
+    SiteStats.objects.using(db).update_or_create(
+        pk=1,
+        defaults={
+            "active_users": User.objects.using(db).filter(is_active=True).count(),
+            "total_books": Book.objects.using(db).count(),
+            "approved_books": Book.objects.using(db).filter(is_approved=True).count(),
+            "pending_books": Book.objects.using(db).filter(is_approved=False).count(),
+            "sold_books": Book.objects.using(db).filter(status="sold").count(),
+            "total_orders": Order.objects.using(db).count(),
+            "revenue": Transaction.objects.using(db)
+            .filter(status="success")
+            .aggregate(total=Sum("amount"))["total"]
+            or 0,
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_book_fts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiteStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("active_users", models.IntegerField(default=0)),
+                ("total_books", models.IntegerField(default=0)),
+                ("approved_books", models.IntegerField(default=0)),
+                ("pending_books", models.IntegerField(default=0)),
+                ("sold_books", models.IntegerField(default=0)),
+                ("total_orders", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_notification_outbox"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user", "is_read"], name="notification_user_unread_idx"
+            ),
+        ),
+    ]
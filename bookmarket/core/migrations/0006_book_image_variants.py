@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_notification_unread_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
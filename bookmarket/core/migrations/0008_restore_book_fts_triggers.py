@@ -0,0 +1,20 @@
+import importlib
+
+from django.db import migrations
+
+# On SQLite, AddField in 0006 rebuilds core_book (new__core_book, drop,
+# rename), which drops the FTS sync triggers created in 0002. Recreate them
+# and re-index the books written since. Later rebuilds need no migration
+# like this one: core.search.restore_fts_index runs after every migrate.
+book_fts = importlib.import_module('core.migrations.0002_book_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(book_fts.run_statements(book_fts.CREATE_SQL), migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_restore_book_fts_triggers"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="created_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
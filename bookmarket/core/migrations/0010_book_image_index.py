@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_notification_event_time"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="book",
+            index=models.Index(fields=["image"], name="book_image_idx"),
+        ),
+    ]
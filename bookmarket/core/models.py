@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.core.validators import RegexValidator
+from django.utils import timezone
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('buyer', 'Buyer'),
@@ -22,6 +24,21 @@ class User(AbstractUser):
     groups = models.ManyToManyField(Group, related_name='custom_users', blank=True)
     user_permissions = models.ManyToManyField(Permission, related_name='custom_users_permissions', blank=True)
     reset_code = models.CharField(max_length=10, blank=True, null=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Password reset looks users up by email OR phone number
+            models.Index(fields=['email'], name='user_email_idx'),
+            models.Index(fields=['phone_number'], name='user_phone_idx'),
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Users built from JWT claims (core/authentication.py) load all
+        # their missing fields with the first one that is read
+        if fields is not None and getattr(self, '_from_token', False):
+            fields = list(self.get_deferred_fields().union(fields))
+            self._from_token = False
+        super().refresh_from_db(using, fields, from_queryset)
 class Category(models.Model):
     name = models.CharField(max_length=100)
 
@@ -42,6 +59,8 @@ class Book(models.Model):
     condition = models.CharField(max_length=10, choices=CONDITION_CHOICES)
     description = models.TextField()
     image = models.ImageField(upload_to='book_covers/', null=True, blank=True)
+    # Resized copies of `image`, filled in by the thumbnail workers (core/images.py)
+    image_variants = models.JSONField(default=dict, blank=True)
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='books')
     is_approved = models.BooleanField(default=False) # برای تایید ادمین
     created_at = models.DateTimeField(auto_now_add=True)
@@ -51,6 +70,19 @@ class Book(models.Model):
         default='pending'
     )
     is_approved = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Public catalogue: approved books newest first, read in index
+            # order (the status filters are applied while walking it). Partial,
+            # since SQLite compares the boolean as a bare `WHERE is_approved`
+            models.Index(fields=['-created_at'], condition=Q(is_approved=True), name='book_catalogue_idx'),
+            # Seller inventory, newest first
+            models.Index(fields=['seller', 'created_at'], name='book_seller_created_idx'),
+            # Whether another book still uses a replaced cover (core/images.py)
+            models.Index(fields=['image'], name='book_image_idx'),
+        ]
+
     def __str__(self):return f"{self.title} - {self.status}"
     def save(self, *args, **kwargs):
         # Logic: If approved and still pending, move to available
@@ -70,12 +102,44 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Purchases and invoices of a buyer, newest first (cursor pagination)
+            models.Index(fields=['buyer', 'created_at'], name='order_buyer_created_idx'),
+            # Seller sales: orders of the seller's books by status
+            models.Index(fields=['book', 'status'], name='order_book_status_idx'),
+        ]
+
 class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    # Time of the event; the outbox worker fills it in when it delivers later
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Serves the unread badge count without touching the table rows
+            models.Index(fields=['user', 'is_read'], name='notification_user_unread_idx'),
+            # Notification list, newest first
+            models.Index(fields=['user', 'created_at'], name='notification_user_created_idx'),
+        ]
+
+class NotificationOutbox(models.Model):
+    """
+    Pending notifications written in the request path and delivered to
+    Notification in batches by the outbox worker (see core/outbox.py).
+    `payload` is a list of {"user": <id>, "message": <text>} entries.
+    """
+    payload = models.JSONField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return f"Outbox #{self.id} ({len(self.payload)} notifications)"
+
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
@@ -119,4 +183,22 @@ class SupportTicket(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.subject} - {self.user.username}"
\ No newline at end of file
+        return f"{self.subject} - {self.user.username}"
+
+class SiteStats(models.Model):
+    """
+    Single-row table of site-wide counters used by AdminReportView.
+    Kept up to date incrementally by core/stats.py and periodically
+    rebuilt by the `reconcile_stats` management command.
+    """
+    active_users = models.IntegerField(default=0)
+    total_books = models.IntegerField(default=0)
+    approved_books = models.IntegerField(default=0)
+    pending_books = models.IntegerField(default=0)
+    sold_books = models.IntegerField(default=0)
+    total_orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats updated at {self.updated_at}"
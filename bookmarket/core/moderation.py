@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models import Q
+
+from . import stats
+from .cache import catalogue_cache
+from .models import Book, Notification
+
+# core/moderation.py
+
+
+CHUNK_SIZE = 500
+
+
+class ModerationConflict(Exception):
+    pass
+
+# decision -> (rows the transition applies to, fields it sets, seller message)
+TRANSITIONS = {
+    'approve': (
+        Q(status='pending'),
+        {'is_approved': True, 'status': 'available'},
+        "Book approved: '{title}' is now visible to buyers.",
+    ),
+    'reject': (
+        ~Q(status='sold') & (Q(is_approved=True) | ~Q(status='pending')),
+        {'is_approved': False, 'status': 'pending'},
+        "Unfortunately, your book '{title}' was rejected and set back to pending.",
+    ),
+}
+
+
+def applies(decision, status, is_approved):
+    if decision == 'approve':
+        return status == 'pending'
+    return status != 'sold' and (is_approved or status != 'pending')
+
+
+def moderate_books(queryset, decision, requested_ids=None):
+    """
+    Approve or reject every book in `queryset` in one transaction:
+    one SELECT of the matching ids (locking the rows where the database
+    supports it), then per CHUNK_SIZE ids one SELECT to work out the
+    outcomes, one UPDATE for the status transition and one bulk_create for
+    the seller notifications, and finally one UPDATE of the site counters.
+    Only the ids of the whole batch are held in memory, and no statement
+    binds more than CHUNK_SIZE of them. The UPDATE is limited to the books
+    found in a state the transition applies to and still guarded by that
+    state, so concurrent moderators cannot both change (and notify about)
+    the same book.
+    Returns ({book id: outcome}, number of books changed). Outcomes are
+    'approved' / 'rejected', 'unchanged' (already in that state),
+    'skipped_sold' or 'not_found' (requested ids outside the queryset).
+    """
+    condition, changes, message = TRANSITIONS[decision]
+    outcomes = {pk: 'not_found' for pk in requested_ids or ()}
+
+    changed = flipped = 0
+
+    with transaction.atomic():
+        pks = list(queryset.select_for_update().values_list('id', flat=True))
+        for start in range(0, len(pks), CHUNK_SIZE):
+            rows = Book.objects.filter(id__in=pks[start:start + CHUNK_SIZE]).values_list(
+                'id', 'seller_id', 'title', 'status', 'is_approved',
+            )
+            changed_ids, changed_rows = [], []
+            for pk, seller_id, title, status, is_approved in rows:
+                if applies(decision, status, is_approved):
+                    outcomes[pk] = 'approved' if decision == 'approve' else 'rejected'
+                    changed_ids.append(pk)
+                    changed_rows.append((seller_id, title, is_approved))
+                else:
+                    outcomes[pk] = 'skipped_sold' if status == 'sold' else 'unchanged'
+            if not changed_rows:
+                continue
+
+            updated = Book.objects.filter(condition, id__in=changed_ids).update(**changes)
+            if updated != len(changed_ids):
+                # Another moderator got in between (no row locks on this database):
+                # undo everything rather than notify about changes made by someone else
+                raise ModerationConflict("Books changed while being moderated, please retry.")
+            Notification.objects.bulk_create([
+                Notification(user_id=seller_id, message=message.format(title=title))
+                for seller_id, title, _ in changed_rows
+            ])
+            changed += len(changed_rows)
+            flipped += sum(1 for _, _, is_approved in changed_rows if is_approved != changes['is_approved'])
+
+        if changed:
+            # The UPDATE skips Book.save() and its signals, so adjust the counters here
+            sign = 1 if changes['is_approved'] else -1
+            stats.apply_delta({'approved_books': sign * flipped, 'pending_books': -sign * flipped})
+            transaction.on_commit(catalogue_cache.invalidate)
+
+    return outcomes, changed
@@ -0,0 +1,207 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationOutbox, User
+
+# core/outbox.py
+
+logger = logging.getLogger(__name__)
+
+# claim() looks at this many times BATCH_SIZE of the oldest pending rows
+SCAN_FACTOR = 4
+
+
+class ClaimLost(Exception):
+    """
+    A row's claim expired and another worker claimed it in the meantime.
+    """
+
+
+def get_option(name, default):
+    return getattr(settings, 'NOTIFICATION_OUTBOX', {}).get(name, default)
+
+
+def enqueue(*notifications):
+    """
+    Record notifications for later delivery with a single INSERT.
+    Each argument is a (user_id, message) pair.
+    """
+    row = NotificationOutbox.objects.create(
+        payload=[{'user': user_id, 'message': message} for user_id, message in notifications]
+    )
+    if get_option('IN_PROCESS_WORKER', False):
+        transaction.on_commit(in_process_worker.wake)
+    return row
+
+
+def row_users(payload):
+    return {item.get('user') for item in payload}
+
+
+def claim(batch_size, max_attempts):
+    """
+    Claim up to `batch_size` due rows, oldest first, and return them.
+
+    Each row is claimed with its own conditional UPDATE that moves its
+    available_at CLAIM_TIMEOUT seconds ahead. Of several workers racing
+    for a row exactly one UPDATE matches, so workers claim disjoint
+    batches and deliver them in parallel. A row whose worker died
+    becomes due again once its claim expires.
+
+    Rows are delivered in order per user: a row is skipped while an older
+    pending row for one of its users is outside this batch (claimed by
+    another worker, or waiting for a retry). Dead-lettered rows do not
+    hold anything up.
+    """
+    now = timezone.now()
+    claimed_until = now + timedelta(seconds=get_option('CLAIM_TIMEOUT', 60))
+    pending = NotificationOutbox.objects.filter(attempts__lt=max_attempts)
+    due = pending.filter(available_at__lte=now)
+    # Every row older than a claimed one is in this window, so none is overtaken
+    window = pending.order_by('id').values_list('id', 'available_at', 'payload')[:batch_size * SCAN_FACTOR]
+    blocked, claimed = set(), []
+    with transaction.atomic():
+        for row_id, available_at, payload in window:
+            if len(claimed) == batch_size:
+                break
+            users = row_users(payload)
+            if available_at <= now and not users & blocked and due.filter(pk=row_id).update(available_at=claimed_until):
+                claimed.append(row_id)
+            else:
+                blocked |= users
+    return list(NotificationOutbox.objects.filter(id__in=claimed).order_by('id'))
+
+
+def drain_batch(batch_size=None):
+    """
+    Claim a batch of due outbox rows (see `claim`) and deliver it in one
+    transaction.
+
+    Each user's notifications arrive in the order they were recorded, with
+    the time they were recorded. If the batch fails, rows are retried one
+    at a time so a single bad row cannot block other users; failing rows
+    are rescheduled with exponential backoff, and the later rows of their
+    users are released to wait for them. A row that fails MAX_ATTEMPTS
+    times is dead-lettered: it stays in the table with its last error, is
+    no longer picked up and no longer holds up its users' later rows.
+    Returns the number of outbox rows delivered.
+    """
+    batch_size = batch_size or get_option('BATCH_SIZE', 500)
+    max_attempts = get_option('MAX_ATTEMPTS', 5)
+
+    rows = claim(batch_size, max_attempts)
+    if not rows:
+        return 0
+    try:
+        with transaction.atomic():
+            deliver(rows)
+        return len(rows)
+    except OperationalError:
+        # Lock contention or a lost connection, not a bad row: the rows
+        # are delivered again once their claim expires
+        raise
+    except Exception:
+        logger.exception("Outbox batch failed, retrying rows one by one")
+
+    delivered = 0
+    # Users whose older row is not delivered: their later rows must wait
+    held = set()
+    for row in rows:
+        # Only while the row is still ours
+        owned = NotificationOutbox.objects.filter(pk=row.pk, available_at=row.available_at)
+        users = row_users(row.payload)
+        if users & held:
+            # Due again right away; claim() holds it back until the older row is gone
+            owned.update(available_at=timezone.now())
+            held |= users
+            continue
+        try:
+            with transaction.atomic():
+                deliver([row])
+            delivered += 1
+        except ClaimLost:
+            held |= users
+        except Exception as exc:
+            attempts = row.attempts + 1
+            owned.update(
+                attempts=attempts,
+                last_error=repr(exc),
+                available_at=timezone.now() + timedelta(seconds=2 ** attempts),
+            )
+            if attempts >= max_attempts:
+                logger.error("Outbox row %s dead-lettered after %s attempts: %r", row.pk, attempts, exc)
+            else:
+                held |= users
+    return delivered
+
+
+def deliver(rows):
+    items = [item for row in rows for item in row.payload]
+    # Users deleted since the event was recorded have nobody to notify
+    existing = set(
+        User.objects.filter(id__in={item['user'] for item in items}).values_list('id', flat=True)
+    )
+    Notification.objects.bulk_create([
+        Notification(user_id=item['user'], message=item['message'], created_at=row.created_at)
+        for row in rows
+        for item in row.payload
+        if item['user'] in existing
+    ])
+    # A row whose claim expired may be delivered by its new owner: roll back
+    deleted, _ = NotificationOutbox.objects.filter(
+        id__in=[row.id for row in rows], available_at__in={row.available_at for row in rows}
+    ).delete()
+    if deleted != len(rows):
+        raise ClaimLost()
+
+
+def drain(batch_size=None):
+    """
+    Deliver batches until nothing is due. Returns the number of rows delivered.
+    """
+    total = 0
+    while True:
+        delivered = drain_batch(batch_size)
+        if not delivered:
+            return total
+        total += delivered
+
+
+class OutboxWorker:
+    """
+    Background thread that drains the outbox whenever a request commits
+    new rows, and otherwise every `interval` seconds (to pick up retries).
+    Enabled with NOTIFICATION_OUTBOX['IN_PROCESS_WORKER']; deployments can
+    instead run `manage.py process_outbox` as a separate worker pool.
+    """
+
+    def __init__(self, interval=5):
+        self.interval = interval
+        self.event = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def wake(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='outbox-worker', daemon=True)
+                self.thread.start()
+        self.event.set()
+
+    def run(self):
+        while True:
+            self.event.wait(self.interval)
+            self.event.clear()
+            close_old_connections()
+            try:
+                drain()
+            except Exception:
+                logger.exception("Outbox worker failed")
+
+
+in_process_worker = OutboxWorker()
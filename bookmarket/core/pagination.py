@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+# core/pagination.py
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (-created_at, -id).
+    Each page is a `WHERE created_at < <cursor>` query, so deep pages cost
+    the same as the first one and no COUNT(*) is ever issued.
+    Rows sharing the same created_at are resolved by the offset DRF keeps
+    inside the cursor, and `id` keeps their order deterministic.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # Keep relevance order for ?search= unless the client asked for ?ordering=
+        if ordering == self.ordering and 'search_rank' in queryset.query.annotations:
+            return ('search_rank', '-id')
+        return ordering
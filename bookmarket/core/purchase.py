@@ -0,0 +1,85 @@
+import uuid
+
+from django.db import transaction
+
+from . import stats
+from .cache import catalogue_cache
+from .models import Book, Order, Transaction
+from .signals import notify_order_status
+
+# core/purchase.py
+
+
+class PurchaseError(Exception):
+    pass
+
+
+class BookUnavailable(PurchaseError):
+    def __init__(self):
+        super().__init__("This book is already sold or not available for purchase.")
+
+
+class OrderAlreadyPaid(PurchaseError):
+    def __init__(self):
+        super().__init__("Order already paid")
+
+
+def new_ref_id():
+    return str(uuid.uuid4())[:8]
+
+
+def claim_book(book_id):
+    """
+    Atomically flip an available book to sold.
+    The WHERE clause makes this a compare-and-set: of several concurrent
+    buyers exactly one UPDATE matches the row, everybody else gets 0.
+    """
+    claimed = Book.objects.filter(pk=book_id, status='available', is_approved=True).update(status='sold')
+    if not claimed:
+        raise BookUnavailable()
+    # The UPDATE bypasses Book.save(), so do its bookkeeping here
+    stats.apply_delta({'sold_books': 1})
+    transaction.on_commit(catalogue_cache.invalidate)
+
+
+def purchase_book(book, buyer):
+    """
+    Buy `book` for `buyer` in one transaction:
+    claim the book, insert the paid order and its successful transaction.
+    Raises BookUnavailable if somebody else got there first.
+    """
+    with transaction.atomic(), stats.batched():
+        claim_book(book.pk)
+        order = Order.objects.create(book=book, buyer=buyer, status='paid')
+        payment = Transaction.objects.create(
+            order=order, amount=book.price, status='success', ref_id=new_ref_id()
+        )
+    book.status = 'sold'
+    return order, payment
+
+
+def pay_order(order):
+    """
+    Pay a pending order: mark it paid (only once, even under concurrent
+    requests), claim its book and record the successful transaction.
+    The conditional UPDATE skips Order's post_save, so the buyer's status
+    notification is queued here. Load the order with
+    select_related('book', 'transaction') to spare two lookups.
+    """
+    with transaction.atomic(), stats.batched():
+        if not Order.objects.filter(pk=order.pk).exclude(status='paid').update(status='paid'):
+            raise OrderAlreadyPaid()
+        claim_book(order.book_id)
+        order.status = 'paid'
+        notify_order_status(order)
+        # No other request gets past the order UPDATE above, so the
+        # transaction loaded with the order is still current
+        try:
+            payment = order.transaction
+        except Transaction.DoesNotExist:
+            payment = Transaction(order=order)
+        payment.amount = order.book.price
+        payment.status = 'success'
+        payment.ref_id = new_ref_id()
+        payment.save()
+    return payment
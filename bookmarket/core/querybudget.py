@@ -0,0 +1,184 @@
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from rest_framework import serializers
+
+# core/querybudget.py
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def _relation_paths(model, serializer, prefix=()):
+    """
+    Walk the serializer fields and collect the relation paths their
+    `source=` attributes traverse, e.g. source='seller.username' -> ('seller',).
+    Nested serializers are followed with their own source as the prefix.
+    """
+    paths = []
+    for field in serializer.fields.values():
+        if field.write_only or not field.source_attrs:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            paths.append(prefix + tuple(field.source_attrs))
+            paths.extend(_relation_paths(model, field.child, prefix + tuple(field.source_attrs)))
+        elif isinstance(field, serializers.BaseSerializer):
+            paths.append(prefix + tuple(field.source_attrs))
+            paths.extend(_relation_paths(model, field, prefix + tuple(field.source_attrs)))
+        elif isinstance(field, serializers.ManyRelatedField):
+            paths.append(prefix + tuple(field.source_attrs))
+        elif len(field.source_attrs) > 1:
+            # The last attribute is read from the related object itself
+            paths.append(prefix + tuple(field.source_attrs[:-1]))
+    return paths
+
+
+def _classify(model, path):
+    """
+    Split a relation path into its select_related part (forward FK and
+    one-to-one hops) and the prefetch_related remainder (reverse FK / M2M).
+    Returns (select_path, prefetch_path); either may be None.
+    """
+    select = []
+    for index, name in enumerate(path):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Property or method on the model, nothing more to load
+            break
+        if not field.is_relation:
+            break
+        if field.many_to_one or field.one_to_one:
+            select.append(name)
+            model = field.related_model
+            continue
+        # Everything from here on has to be prefetched
+        return ('__'.join(select) or None, '__'.join(path[:index + 1]))
+    return ('__'.join(select) or None, None)
+
+
+@lru_cache(maxsize=None)
+def related_fields_for(serializer_class):
+    """
+    Return (select_related, prefetch_related) tuples for a ModelSerializer class.
+    Cached per class; serializer fields are declared statically.
+    """
+    model = serializer_class.Meta.model
+    select, prefetch = set(), set()
+    for path in _relation_paths(model, serializer_class()):
+        select_path, prefetch_path = _classify(model, path)
+        if select_path:
+            select.add(select_path)
+        if prefetch_path:
+            prefetch.add(prefetch_path)
+    # Drop paths already covered by a longer one (book is implied by book__seller)
+    select = {p for p in select if not any(o.startswith(p + '__') for o in select)}
+    return tuple(sorted(select)), tuple(sorted(prefetch))
+
+
+def optimize_queryset(queryset, serializer_class):
+    select, prefetch = related_fields_for(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() hook that counts executed statements.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class RequestQueryCounter(QueryCounter):
+    """
+    QueryCounter installed on every database alias (reads may go to a
+    replica) for the lifetime of a request.
+    """
+
+    def install(self):
+        self.wrapped = connections.all()
+        for connection in self.wrapped:
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self):
+        for connection in self.wrapped:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self.wrapped = []
+
+
+class QueryBudgetMixin:
+    """
+    Declarative per-action SQL budgets for views and viewsets.
+
+        query_budgets = {'list': 1, 'retrieve': 1}
+
+    The querysets returned by get_queryset() get the select_related /
+    prefetch_related calls derived from the serializer's `source=` paths.
+    Queries issued after authentication/permission checks are counted on
+    every database alias and compared to the budget; QUERY_BUDGET_MODE chooses between 'off',
+    'warn' (log) and 'raise'.
+    """
+    query_budgets = {}
+
+    def get_query_budget(self):
+        if getattr(self, 'query_budget_exempt', False):
+            return None
+        key = getattr(self, 'action', None) or self.request.method.lower()
+        return self.query_budgets.get(key)
+
+    def optimize_queryset(self, queryset, serializer_class=None):
+        return optimize_queryset(queryset, serializer_class or self.get_serializer_class())
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.optimize_queryset(queryset)
+
+    def dispatch(self, request, *args, **kwargs):
+        if getattr(settings, 'QUERY_BUDGET_MODE', 'off') == 'off':
+            return super().dispatch(request, *args, **kwargs)
+        self.query_counter = RequestQueryCounter()
+        self.query_counter.install()
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.query_counter.uninstall()
+
+    def initial(self, request, *args, **kwargs):
+        try:
+            super().initial(request, *args, **kwargs)
+        finally:
+            # Authentication and permission lookups (failed ones too) are not part of the budget
+            if hasattr(self, 'query_counter'):
+                self.query_counter.count = 0
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        counter = getattr(self, 'query_counter', None)
+        budget = self.get_query_budget()
+        if counter is None or budget is None or counter.count <= budget:
+            return response
+
+        message = (
+            f'{self.__class__.__name__}.{getattr(self, "action", None) or request.method.lower()} '
+            f'issued {counter.count} queries (budget {budget})'
+        )
+        if settings.QUERY_BUDGET_MODE == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+        return response
@@ -0,0 +1,161 @@
+import csv
+import datetime
+import io
+import math
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# core/renderers.py
+
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        # Let DRF's encoder format these, so the output matches JSONRenderer
+        orjson.OPT_PASSTHROUGH_DATETIME
+        # json.dumps turns int keys into strings
+        | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def has_non_finite(data):
+    """
+    True if `data` holds a NaN or infinite float or Decimal anywhere in its
+    dicts and lists.
+    """
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, Decimal):
+        return not data.is_finite()
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(item) for item in data)
+    return False
+
+
+def encode_default(obj, _encoder=encoders.JSONEncoder()):
+    """
+    orjson fallback for the types it does not handle itself (Decimal,
+    datetime/date/time, timedelta, lazy strings, querysets, ...): converted
+    exactly as DRF's JSONEncoder does.
+    """
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer on top of orjson.
+
+    Produces the same bytes as JSONRenderer with the default UNICODE_JSON /
+    COMPACT_JSON settings: compact separators, UTF-8, U+2028/U+2029 escaped,
+    Decimal, datetime and UUID values converted the same way. The one
+    difference is the spelling of floats outside 1e-4..1e16 (`1e16` rather
+    than `1e+16`), which parse to the same number; serializer output never
+    contains those since DecimalField renders strings.
+    Falls back to JSONRenderer for indented output (the browsable API),
+    ASCII-only output, and values orjson rejects (integers wider than 64
+    bits), or when orjson is not installed. It also falls back for NaN and
+    infinity, which orjson writes as null: JSONRenderer raises ValueError
+    for them (or writes NaN/Infinity when STRICT_JSON is off).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Only a response with a null in it can hide a non-finite number
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, so the output stays a strict javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON: one line per item of a list (or a single line
+    for anything else). Streaming views check for `format == 'ndjson'` and
+    write the lines themselves instead of building the list.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+    line_renderer = ORJSONRenderer()
+
+    def render_line(self, item):
+        return self.line_renderer.render(item) + b'\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        return b''.join(self.render_line(item) for item in items)
+
+
+# Leading characters that make spreadsheet applications evaluate a cell
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with a header row taken from the keys of the first item. Used
+    for error responses of the export views; the exports themselves are
+    streamed with `render_rows`.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def format_value(self, value):
+        # Same spelling as the JSON renderers
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return encode_default(value)
+        # Text that a spreadsheet would run as a formula (user-supplied titles, names)
+        if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+            return "'" + value
+        return value
+
+    def render_rows(self, rows, header=None, columns=None):
+        """
+        Render an iterable of dicts (plus the header row when given) as CSV
+        bytes, taking the values in `columns` order (default: the header).
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header is not None:
+            writer.writerow(header)
+        columns = columns or header
+        for row in rows:
+            values = row.values() if columns is None else (row[name] for name in columns)
+            writer.writerow([self.format_value(value) for value in values])
+        return buffer.getvalue().encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        if not items:
+            return b''
+        return self.render_rows(items, header=list(items[0]))
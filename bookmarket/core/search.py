@@ -0,0 +1,153 @@
+import importlib
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+# core/search.py
+
+FTS_TABLE = 'core_book_fts'
+# Keep FTS_TABLE in sync with core_book (created by migration 0002)
+FTS_TRIGGERS = ('core_book_fts_ai', 'core_book_fts_ad', 'core_book_fts_au')
+
+# Only word characters survive; everything else (quotes, operators, '*') is a separator
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class BaseSearchBackend:
+    """
+    Interface for book search backends.
+    `search()` receives a Book queryset and the list of search terms and
+    returns a filtered (and optionally ranked) queryset.
+    """
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """
+        Re-index every book. Backends without an index do nothing.
+        """
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Plain icontains lookups on title and author.
+    Used as the fallback on databases without FTS5.
+    """
+    fields = ('title', 'author')
+
+    def search(self, queryset, terms):
+        for term in terms:
+            condition = Q()
+            for field in self.fields:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Full-text search over the `core_book_fts` FTS5 table.
+    The table is kept in sync with core_book by triggers (see migration 0002),
+    so bulk inserts and queryset.update() calls are indexed as well.
+    Every term is matched as a prefix and results are ranked with bm25.
+    """
+    fallback = BasicSearchBackend
+
+    def build_match_query(self, terms):
+        tokens = []
+        for term in terms:
+            tokens.extend(TOKEN_RE.findall(term))
+        # Each token becomes a quoted prefix query: "tok"* AND "tok2"*
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, terms):
+        if connection.vendor != 'sqlite':
+            return self.fallback().search(queryset, terms)
+
+        match = self.build_match_query(terms)
+        if not match:
+            return queryset.none()
+
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = core_book.id',
+            (match,),
+            output_field=FloatField(),
+        )
+        matching_ids = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (match,),
+        )
+        # bm25 returns lower scores for better matches
+        return (
+            queryset.filter(id__in=matching_ids)
+            .annotate(search_rank=rank)
+            .order_by('search_rank', '-created_at')
+        )
+
+    def rebuild(self):
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+
+
+def missing_fts_objects(using):
+    """
+    Names of the FTS table and triggers missing from database `using`
+    (always none on other databases than SQLite).
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return []
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )
+        present = {name for name, in cursor.fetchall()}
+    return [name for name in (FTS_TABLE, *FTS_TRIGGERS) if name not in present]
+
+
+def restore_fts_index(using):
+    """
+    Recreate the FTS table and triggers when some are missing, and re-index
+    the books written without them. On SQLite, a migration that alters a
+    column of core_book rebuilds the table and silently drops its triggers;
+    this runs after every `migrate` (post_migrate, see core/signals.py), so
+    such a migration needs no hand-written follow-up.
+    Returns the names that were missing.
+    """
+    missing = missing_fts_objects(using)
+    if missing:
+        book_fts = importlib.import_module('core.migrations.0002_book_fts')
+        with connections[using].cursor() as cursor:
+            # CREATE ... IF NOT EXISTS, then a full 'rebuild'
+            for statement in book_fts.CREATE_SQL:
+                cursor.execute(statement)
+    return missing
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'BOOK_SEARCH_BACKEND', 'core.search.SQLiteFTSBackend')
+    return import_string(backend_path)()
+
+
+class BookSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for DRF's SearchFilter that delegates `?search=`
+    to the configured book search backend instead of LIKE '%term%' scans.
+    An explicit `?ordering=` still wins over the relevance order, because
+    OrderingFilter runs after this backend.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, terms)
@@ -2,6 +2,11 @@ from rest_framework import serializers
 from .models import SupportTicket, Transaction, User, Book, Order, Notification, Category
 from django.core.validators import RegexValidator
 from rest_framework.validators import UniqueValidator
+from .cache import category_map
+from .images import variant_urls
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import CREDENTIALS_CLAIM, token_credentials
+import time
 
 # core/serializers.py
 
@@ -46,16 +51,25 @@ class CategorySerializer(serializers.ModelSerializer):
 class BookSerializer(serializers.ModelSerializer):
     seller_name = serializers.ReadOnlyField(source='seller.username')
     seller_contact = serializers.ReadOnlyField(source='seller.phone_number')
-    category_name = serializers.ReadOnlyField(source='category.name')
+    # Resolved from the in-process category map instead of joining core_category
+    category_name = serializers.SerializerMethodField()
+    # {size: {width, height, jpeg, webp}}, generated in the background after upload
+    image_variants = serializers.SerializerMethodField()
     class Meta:
         model = Book
         fields = [
             'id', 'title', 'author', 'category', 'category_name', 
-            'price', 'condition', 'description', 'image', 
+            'price', 'condition', 'description', 'image', 'image_variants',
             'seller', 'seller_name', 'seller_contact', 'is_approved','status', 'created_at'
         ]
         read_only_fields = ['is_approved', 'seller']
 
+    def get_category_name(self, obj):
+        return category_map.name_for(obj.category_id)
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj, self.context.get('request'))
+
 class RegisterSerializer(serializers.ModelSerializer):
     # Password must be write-only
     password = serializers.CharField(write_only=True)
@@ -118,6 +132,14 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     code = serializers.CharField(max_length=6, required=True)
     new_password = serializers.CharField(min_length=8, write_only=True, required=True)
 
+
+class IdListSerializer(serializers.Serializer):
+    """
+    {"ids": [1, 2, 3]} for the batch endpoints: a JSON list or repeated
+    form fields. A bare string or number is rejected, never iterated.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
 # from rest_framework import serializers
 # from .models import User
 
@@ -194,4 +216,22 @@ class SupportTicketSerializer(serializers.ModelSerializer):
             # For Regular User: Admin reply is completely hidden or read-only
             # کاربر معمولی اصلاً نباید فیلد پاسخ را در فرم ارسال ببیند
             self.fields['admin_reply'].read_only = True
-            self.fields['is_resolved'].read_only = True
\ No newline at end of file
+            self.fields['is_resolved'].read_only = True
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the user's role, staff and active flags and a credentials
+    fingerprint to the tokens, so that CachedJWTAuthentication can
+    authenticate regular users without loading them.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['role'] = user.role
+        token['is_staff'] = user.is_staff
+        token['is_active'] = user.is_active
+        token[CREDENTIALS_CLAIM] = token_credentials(user)
+        # When the claims were read (copied into refreshed access tokens, unlike iat)
+        token['claims_at'] = time.time()
+        return token
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
-from .models import Order, SupportTicket, Transaction, Notification
+from .cache import catalogue_cache, category_map
+from .models import Book, Category, Order, SupportTicket, Transaction, Notification, User
+from . import images, outbox, search, stats
+from .authentication import user_cache
 
 @receiver(post_save, sender=Transaction)
 def create_payment_notification(sender, instance, created, **kwargs):
@@ -9,28 +14,29 @@ def create_payment_notification(sender, instance, created, **kwargs):
     when a transaction is successfully completed.
     """
     if created and instance.status == 'success':
-        # Notification for the Buyer
-        Notification.objects.create(
-            user=instance.order.buyer,
-            message=f"Your payment for order #{instance.order.id} was successful. Tracking code: {instance.ref_id}"
-        )
-        
-        # Notification for the Seller
-        Notification.objects.create(
-            user=instance.order.book.seller,
-            message=f"Your book '{instance.order.book.title}' has been sold! Order #{instance.order.id} is ready for shipping."
+        order = instance.order
+        # One outbox row carries both the buyer's and the seller's notification
+        outbox.enqueue(
+            (order.buyer_id, f"Your payment for order #{order.id} was successful. Tracking code: {instance.ref_id}"),
+            (order.book.seller_id, f"Your book '{order.book.title}' has been sold! Order #{order.id} is ready for shipping."),
         )
 
+def notify_order_status(order):
+    """
+    Queue the buyer's "status updated" notification for `order`. Also
+    called by code that changes the status with an UPDATE (no post_save).
+    """
+    outbox.enqueue(
+        (order.buyer_id, f"The status of your order #{order.id} has been updated to: {order.status}."),
+    )
+
 @receiver(post_save, sender=Order)
 def create_order_status_notification(sender, instance, created, **kwargs):
     """
     Sends a notification to the buyer whenever the order status changes (e.g., Shipped).
     """
     if not created:
-        Notification.objects.create(
-            user=instance.buyer,
-            message=f"The status of your order #{instance.id} has been updated to: {instance.status}."
-        )
+        notify_order_status(instance)
 # core/signals.py
 
 @receiver(post_save, sender=SupportTicket)
@@ -40,8 +46,108 @@ def notify_user_on_admin_reply(sender, instance, created, **kwargs):
     """
     # Check if this is an update (not a new ticket) and if admin has provided a reply
     if not created and instance.admin_reply:
-        # Create a notification for the user who opened the ticket
-        Notification.objects.create(
-            user=instance.user,
-            message=f"Admin has replied to your ticket: '{instance.subject}'. Check support history."
-        )
\ No newline at end of file
+        # Queue a notification for the user who opened the ticket
+        outbox.enqueue(
+            (instance.user_id, f"Admin has replied to your ticket: '{instance.subject}'. Check support history."),
+        )
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalogue_cache(sender, **kwargs):
+    """
+    Any saved, approved, rejected, sold or deleted book (or renamed category)
+    makes every cached catalogue page stale.
+    """
+    catalogue_cache.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_map(sender, **kwargs):
+    """
+    Bumps the shared category version so every worker reloads its map.
+    """
+    category_map.invalidate()
+
+
+@receiver(post_save, sender=Book)
+def schedule_image_variants(sender, instance, **kwargs):
+    """
+    Queues thumbnail/WebP generation when a book gets a new cover image.
+    """
+    if 'image' in instance.get_deferred_fields() or 'image_variants' in instance.get_deferred_fields():
+        return
+    if images.needs_variants(instance):
+        book_id = instance.pk
+        transaction.on_commit(lambda: images.schedule_variants(book_id))
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=Transaction)
+def remember_stats_snapshot(sender, instance, update_fields=None, **kwargs):
+    """
+    Remembers what the stored row contributes to SiteStats so that
+    update_site_stats can apply only the difference. Costs one query,
+    skipped for new rows and for saves that leave the counted fields alone.
+    """
+    _, fields = stats.CONTRIBUTIONS[sender]
+    if instance._state.adding:
+        instance._stats_snapshot = {}
+    elif update_fields is not None and not set(fields).intersection(update_fields):
+        # Nothing counted changes (e.g. save(update_fields=['last_login']))
+        instance._stats_snapshot = None
+    else:
+        instance._stats_snapshot = stats.stored_snapshot(instance)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Transaction)
+def update_site_stats(sender, instance, created, **kwargs):
+    """
+    Applies the change in counters caused by this save as one atomic UPDATE.
+    """
+    old = {} if created else instance.__dict__.pop('_stats_snapshot', None)
+    new = stats.snapshot(instance)
+    # Unknown previous state (deferred fields); reconcile_stats will catch up
+    if old is not None and new is not None:
+        stats.apply_delta(stats.diff(new, old))
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Transaction)
+def remove_from_site_stats(sender, instance, **kwargs):
+    old = stats.snapshot(instance)
+    if old:
+        stats.apply_delta({name: -value for name, value in old.items()})
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Role changes (UserViewSet.update_role), deactivation and password
+    resets must not be served from cached rows or old token claims.
+    """
+    user_id = instance.pk
+    user_cache.invalidate(user_id)
+    # Again once committed, in case a request reloaded the old row meanwhile
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_migrate)
+def restore_book_search_index(sender, using, **kwargs):
+    """
+    Puts back the FTS sync triggers that a table rebuild of core_book
+    dropped (see search.restore_fts_index).
+    """
+    if sender.label != 'core':
+        return
+    applied = MigrationRecorder(connections[using]).applied_migrations()
+    if ('core', '0002_book_fts') in applied:
+        search.restore_fts_index(using)
@@ -0,0 +1,131 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Book, Order, SiteStats, Transaction, User
+
+# core/stats.py
+
+STATS_PK = 1
+
+_local = threading.local()
+
+
+def user_contribution(user):
+    return {'active_users': int(user.is_active)}
+
+
+def book_contribution(book):
+    return {
+        'total_books': 1,
+        'approved_books': int(book.is_approved),
+        'pending_books': int(not book.is_approved),
+        'sold_books': int(book.status == 'sold'),
+    }
+
+
+def order_contribution(order):
+    return {'total_orders': 1}
+
+
+def transaction_contribution(transaction):
+    return {'revenue': transaction.amount if transaction.status == 'success' else Decimal('0')}
+
+
+# Which model feeds which counters, and the fields those counters depend on
+CONTRIBUTIONS = {
+    User: (user_contribution, ('is_active',)),
+    Book: (book_contribution, ('is_approved', 'status')),
+    Order: (order_contribution, ()),
+    Transaction: (transaction_contribution, ('amount', 'status')),
+}
+
+
+def snapshot(instance):
+    """
+    Return what `instance` currently adds to the counters, or None when
+    a tracked field is deferred (reading it would cost a query).
+    """
+    contribute, fields = CONTRIBUTIONS[type(instance)]
+    if instance.get_deferred_fields().intersection(fields):
+        return None
+    return contribute(instance)
+
+
+def stored_snapshot(instance):
+    """
+    Return what the stored row of `instance` adds to the counters, read
+    with one values() query of the tracked fields ({} if there is no row).
+    """
+    contribute, fields = CONTRIBUTIONS[type(instance)]
+    if not fields:
+        return contribute(instance)
+    row = type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first()
+    return contribute(SimpleNamespace(**row)) if row is not None else {}
+
+
+def apply_delta(delta):
+    """
+    Add `delta` ({counter: amount}) to the stats row with one atomic UPDATE.
+    Inside `batched()` the delta is only accumulated.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        for name, value in delta.items():
+            pending[name] = pending.get(name, 0) + value
+        return
+    changes = {name: F(name) + value for name, value in delta.items() if value}
+    if changes:
+        SiteStats.objects.filter(pk=STATS_PK).update(updated_at=timezone.now(), **changes)
+
+
+@contextmanager
+def batched():
+    """
+    Collect every delta applied inside the block and write them with a
+    single UPDATE when it exits successfully.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        # Already batching in an outer block
+        yield
+        return
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    apply_delta(pending)
+
+
+def diff(new, old):
+    old = old or {}
+    return {name: value - old.get(name, 0) for name, value in new.items()}
+
+
+def get_stats():
+    stats = SiteStats.objects.filter(pk=STATS_PK).first()
+    if stats is None:
+        stats = reconcile()
+    return stats
+
+
+def reconcile():
+    """
+    Recount everything from the source tables and overwrite the stats row.
+    Fixes drift from bulk operations that bypass model signals.
+    """
+    stats, _ = SiteStats.objects.update_or_create(pk=STATS_PK, defaults={
+        'active_users': User.objects.filter(is_active=True).count(),
+        'total_books': Book.objects.count(),
+        'approved_books': Book.objects.filter(is_approved=True).count(),
+        'pending_books': Book.objects.filter(is_approved=False).count(),
+        'sold_books': Book.objects.filter(status='sold').count(),
+        'total_orders': Order.objects.count(),
+        'revenue': Transaction.objects.filter(status='success').aggregate(total=Sum('amount'))['total'] or 0,
+    })
+    return stats
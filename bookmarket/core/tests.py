@@ -1,3 +1,1432 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+import zlib
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import base_user
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, transaction
+from django.db.utils import ConnectionHandler
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from bookmarket.db_profiles import sqlite_database
+
+from . import bulk_import, db_routers, images, metrics, moderation, outbox, search, stats
+from .authentication import user_cache
+from .middleware import CompressionMiddleware, ReplicaRoutingMiddleware
+from .renderers import ORJSONRenderer
+from .cache import catalogue_cache, category_map, check_shared_caches
+from .models import (
+    Book, Category, Favorite, Notification, NotificationOutbox, Order, SiteStats, SupportTicket, Transaction, User,
+)
+from .purchase import BookUnavailable, claim_book
+
+# core/tests.py
+
+
+def seed_rows(seller, buyer, count):
+    """
+    Create `count` approved books for `seller`, each bought by `buyer`,
+    plus one favorite, notification and support ticket per book.
+    """
+    category = Category.objects.create(name='Programming')
+    books = Book.objects.bulk_create([
+        Book(
+            title=f'Book {i}', author=f'Author {i}', category=category,
+            price=Decimal('10.00'), condition='used', description='...',
+            seller=seller, is_approved=True, status='sold',
+        )
+        for i in range(count)
+    ])
+    orders = Order.objects.bulk_create([Order(book=book, buyer=buyer, status='paid') for book in books])
+    Transaction.objects.bulk_create([
+        Transaction(order=order, amount=Decimal('10.00'), ref_id=f'ref{order.id}', status='success')
+        for order in orders
+    ])
+    Favorite.objects.bulk_create([Favorite(user=buyer, book=book) for book in books])
+    Notification.objects.bulk_create([Notification(user=buyer, message=f'n{i}') for i in range(count)])
+    SupportTicket.objects.bulk_create([
+        SupportTicket(user=buyer, subject='other', message=f't{i}') for i in range(count)
+    ])
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    """
+    Every SQLite profile of bookmarket/db_profiles.py opens connections
+    with its pragmas applied.
+    """
+
+    def connect(self, profile):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # A connection of its own, outside the ones the test runner guards
+        handler = ConnectionHandler({
+            'default': {},
+            'profile': sqlite_database(os.path.join(directory.name, 'db.sqlite3'), profile),
+        })
+        self.addCleanup(handler.close_all)
+        return handler['profile']
+
+    def pragma(self, db, name):
+        with db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_legacy(self):
+        db = self.connect('legacy')
+        self.assertEqual(self.pragma(db, 'journal_mode'), 'delete')
+        self.assertEqual(db.settings_dict['CONN_MAX_AGE'], 0)
+
+    def test_development(self):
+        db = self.connect('development')
+        self.assertEqual(self.pragma(db, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(db, 'synchronous'), 1)
+        self.assertEqual(self.pragma(db, 'foreign_keys'), 1)
+        self.assertEqual(db.transaction_mode, 'IMMEDIATE')
+
+    def test_production(self):
+        db = self.connect('production')
+        self.assertEqual(self.pragma(db, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(db, 'cache_size'), -64 * 1024)
+        self.assertEqual(self.pragma(db, 'temp_store'), 2)
+        self.assertEqual((db.settings_dict['CONN_MAX_AGE'], db.settings_dict['CONN_HEALTH_CHECKS']), (600, True))
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            sqlite_database('db.sqlite3', 'fast')
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class QueryBudgetTests(TestCase):
+    """
+    Every budgeted endpoint must stay within its declared query budget and
+    issue the same number of queries at 10 rows as at 1000 rows.
+    """
+    endpoints = [
+        # (url, authenticate as)
+        ('/api/books/', None),
+        ('/api/books/?search=book', None),
+        ('/api/books/my-inventory/', 'seller'),
+        ('/api/orders/', 'buyer'),
+        ('/api/orders/my-invoices/', 'buyer'),
+        ('/api/notifications/', 'buyer'),
+        ('/api/favorites/', 'buyer'),
+        ('/api/transactions/', 'buyer'),
+        ('/api/support-tickets/', 'buyer'),
+        ('/api/profile/history/', 'buyer'),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        category_map.invalidate()
+        self.users = {
+            'seller': User.objects.create_user('seller', password='pass', role='seller'),
+            'buyer': User.objects.create_user('buyer', password='pass', role='buyer'),
+        }
+
+    def measure(self):
+        counts = {}
+        for url, as_user in self.endpoints:
+            client = APIClient()
+            if as_user:
+                client.force_authenticate(self.users[as_user])
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[url] = response.renderer_context['view'].query_counter.count
+        return counts
+
+    def test_budgets_do_not_grow_with_rows(self):
+        seed_rows(self.users['seller'], self.users['buyer'], 10)
+        small = self.measure()
+        seed_rows(self.users['seller'], self.users['buyer'], 990)
+        large = self.measure()
+        self.assertEqual(small, large)
+
+    def test_book_detail_within_budget(self):
+        seed_rows(self.users['seller'], self.users['buyer'], 10)
+        book = Book.objects.first()
+        response = APIClient().get(f'/api/books/{book.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_checkout_budgets_are_exact(self):
+        # Budgets equal the measured counts, so a new query in checkout shows up here
+        books = [
+            Book.objects.create(
+                title=f'Book {i}', author='A', price=Decimal('10.00'), condition='used', description='...',
+                seller=self.users['seller'], is_approved=True, status='available',
+            )
+            for i in range(2)
+        ]
+        client = APIClient()
+        client.force_authenticate(self.users['buyer'])
+        response = client.post('/api/orders/', {'book': books[0].id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        view = response.renderer_context['view']
+        self.assertEqual(view.query_counter.count, view.query_budgets['create'])
+
+        order = Order.objects.create(book=books[1], buyer=self.users['buyer'], status='pending')
+        response = client.post(f'/api/orders/{order.id}/pay/')
+        self.assertEqual(response.status_code, 200)
+        view = response.renderer_context['view']
+        self.assertEqual(view.query_counter.count, view.query_budgets['pay'])
+
+
+class CursorPaginationTests(TestCase):
+    """
+    Following `next` visits every row exactly once, even when rows are
+    inserted between two page requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids += [row['id'] for row in response.data['results']]
+            yield ids
+            url = response.data['next']
+
+    def test_inserts_do_not_shift_later_pages(self):
+        created = [Notification.objects.create(user=self.user, message=f'n{i}').id for i in range(5)]
+        pages = self.collect('/api/notifications/?page_size=2')
+        next(pages)
+        Notification.objects.create(user=self.user, message='newer')
+        *_, ids = pages
+        self.assertEqual(ids, created[::-1])
+
+    def test_admin_filters_pending_books_on_the_server(self):
+        seller = User.objects.create_user('seller', password='pass', role='seller')
+        pending = set()
+        for i in range(5):
+            book = Book.objects.create(
+                title=f'Book {i}', author='A', price=Decimal('10.00'), condition='used',
+                description='...', seller=seller, is_approved=bool(i % 2),
+            )
+            if not book.is_approved:
+                pending.add(book.id)
+        self.client.force_authenticate(User.objects.create_user('admin', password='pass', is_staff=True, role='admin'))
+        *_, ids = self.collect('/api/books/?is_approved=false&page_size=1')
+        self.assertEqual(sorted(ids), sorted(pending))
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot read paths must be served by indexes: no query of these
+    endpoints may fall back to a full table scan of a growing table.
+    """
+    endpoints = QueryBudgetTests.endpoints + [
+        ('/api/books/?status=sold', None),
+        ('/api/notifications/unread-count/', 'buyer'),
+        ('/api/seller/sales/', 'seller'),
+        ('/api/seller/sales/?start=2026-01-01&end=2026-12-31', 'seller'),
+        ('/api/profile/history/', 'seller'),
+    ]
+    # Tables that grow with traffic; categories and the FTS index are
+    # expected to be scanned
+    tables = ('core_book', 'core_order', 'core_notification', 'core_transaction', 'core_user')
+
+    def setUp(self):
+        cache.clear()
+        category_map.invalidate()
+        self.users = {
+            'seller': User.objects.create_user('seller', password='pass', role='seller', email='seller@example.com'),
+            'buyer': User.objects.create_user('buyer', password='pass', role='buyer'),
+        }
+        seed_rows(self.users['seller'], self.users['buyer'], 50)
+
+    def capture_selects(self, request):
+        """
+        Run `request()` and return the (sql, params) of every SELECT it issued.
+        """
+        selects = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                selects.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            request()
+        return selects
+
+    def full_scans(self, selects):
+        scans = []
+        for sql, params in selects:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                details = [row[3] for row in cursor.fetchall()]
+            for detail in details:
+                words = detail.split()
+                if words[:1] == ['SCAN'] and words[1] in self.tables and 'USING' not in words:
+                    scans.append(f'{detail}: {sql}')
+        return scans
+
+    def test_endpoints_use_indexes(self):
+        for url, as_user in self.endpoints:
+            client = APIClient()
+            if as_user:
+                client.force_authenticate(self.users[as_user])
+            selects = self.capture_selects(lambda: self.assertEqual(client.get(url).status_code, 200, url))
+            self.assertTrue(selects, url)
+            self.assertEqual(self.full_scans(selects), [], url)
+
+    def test_sales_range_covers_whole_days(self):
+        first, second, *_ = Order.objects.order_by('id')
+        utc = datetime.timezone.utc
+        Order.objects.filter(pk=first.pk).update(created_at=datetime.datetime(2026, 3, 31, 23, 59, 59, tzinfo=utc))
+        Order.objects.filter(pk=second.pk).update(created_at=datetime.datetime(2026, 4, 1, tzinfo=utc))
+        client = APIClient()
+        client.force_authenticate(self.users['seller'])
+        response = client.get('/api/seller/sales/?start=2026-03-31&end=2026-03-31')
+        self.assertEqual(response.data['total_sales_count'], 1)
+        response = client.get('/api/seller/sales/?start=2026-04-01&end=2026-04-01')
+        self.assertEqual(response.data['total_sales_count'], 1)
+        self.assertEqual(client.get('/api/seller/sales/?start=2026-02-30').status_code, 400)
+        response = client.get('/api/seller/sales/?start=0001-01-01&end=9999-12-31')
+        self.assertEqual(response.data['total_sales_count'], Order.objects.filter(status='paid').count())
+
+    def test_shared_cover_lookup_uses_an_index(self):
+        variants = {'source': 'book_covers/0123456789abcdef.jpg', 'sizes': {}}
+        selects = self.capture_selects(lambda: images.delete_unused_variants(variants))
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(self.full_scans(selects), [])
+
+    def test_password_reset_lookup_uses_indexes(self):
+        data = {'contact': 'seller@example.com', 'code': '123456', 'new_password': 'new-pass-123'}
+        selects = self.capture_selects(lambda: APIClient().post('/api/password-reset/confirm/', data, format='json'))
+        self.assertTrue(selects)
+        self.assertEqual(self.full_scans(selects), [])
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class LoadTestCommandTests(TransactionTestCase):
+    """
+    seed_marketplace builds a consistent dataset and bench_api reports on
+    every scenario. A TransactionTestCase, since the benchmark threads use
+    their own database connections.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category_map.invalidate()
+
+    def test_seed_then_benchmark(self):
+        call_command(
+            'seed_marketplace', buyers=20, sellers=5, categories=3, books=200, orders=50,
+            favorites=100, notifications=100, batch_size=64, stdout=io.StringIO(),
+        )
+        self.assertEqual(User.objects.filter(username__startswith='seed_').count(), 26)
+        self.assertEqual(Book.objects.filter(status='sold').count(), 50)
+        self.assertEqual(Transaction.objects.filter(order__book__status='sold').count(), 50)
+        self.assertEqual(Favorite.objects.count(), 100)
+        self.assertEqual(SiteStats.objects.get().total_orders, 50)
+
+        out = io.StringIO()
+        call_command('bench_api', requests=6, concurrency=3, warmup=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['orders'], 50)
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['requests'], 6, name)
+            self.assertEqual(result['errors'], 0, (name, result['status_codes']))
+            latency = result['latency_ms']
+            self.assertLessEqual(latency['p50'], latency['p95'], name)
+            self.assertLessEqual(latency['p95'], latency['p99'], name)
+        # Every checkout bought a different book
+        self.assertEqual(Order.objects.count(), 50 + 7)
+
+
+@override_settings(NOTIFICATION_OUTBOX={'IN_PROCESS_WORKER': False})
+class PurchaseTests(TransactionTestCase):
+    """
+    A book is sold once however many buyers race for it, and paying an
+    order notifies its buyer. A TransactionTestCase, since the racing
+    buyers use their own database connections.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        self.book = Book.objects.create(
+            title='Book', author='A', price=Decimal('10.00'), condition='used', description='...',
+            seller=self.seller, is_approved=True, status='available',
+        )
+
+    def test_concurrent_claims_sell_the_book_once(self):
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def buy():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    claim_book(self.book.pk)
+                outcomes.append('won')
+            except BookUnavailable:
+                outcomes.append('lost')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['lost', 'won'])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.status, 'sold')
+
+    def test_pay_notifies_the_buyer(self):
+        order = Order.objects.create(book=self.book, buyer=self.buyer, status='pending')
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        self.assertEqual(client.post(f'/api/orders/{order.id}/pay/').status_code, 200)
+        messages = [
+            item['message'] for row in NotificationOutbox.objects.all() for item in row.payload
+            if item['user'] == self.buyer.id
+        ]
+        self.assertIn(f'The status of your order #{order.id} has been updated to: paid.', messages)
+
+    def test_pay_completes_an_earlier_failed_transaction(self):
+        order = Order.objects.create(book=self.book, buyer=self.buyer, status='pending')
+        Transaction.objects.create(order=order, amount=Decimal('10.00'), status='failed', ref_id='old')
+        stats.reconcile()
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = client.post(f'/api/orders/{order.id}/pay/')
+        self.assertEqual(response.status_code, 200)
+        payment = Transaction.objects.get(order=order)
+        self.assertEqual((payment.status, payment.ref_id), ('success', response.data['tracking_code']))
+        self.assertEqual(SiteStats.objects.get().revenue, Decimal('10.00'))
+        self.assertEqual(client.post(f'/api/orders/{order.id}/pay/').status_code, 400)
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_bench_purchase_reports_no_oversold_books(self):
+        out = io.StringIO()
+        call_command('bench_purchase', buyers=3, books=2, stdout=out)
+        report = out.getvalue()
+        self.assertRegex(report, r'purchased\s+2\n')
+        self.assertRegex(report, r'rejected_400\s+4\n')
+        self.assertIn('Oversold books:    0', report)
+        # The benchmark data is removed afterwards
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+
+
+class SiteStatsTests(TestCase):
+    """
+    Saves apply the difference against the stored row, however stale the
+    saved instance, and loading rows costs nothing extra.
+    """
+    counters = ('active_users', 'total_books', 'approved_books', 'pending_books', 'sold_books', 'total_orders')
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        stats.reconcile()
+
+    def assertStatsMatchTables(self):
+        current = SiteStats.objects.values(*self.counters).get()
+        stats.reconcile()
+        self.assertEqual(current, SiteStats.objects.values(*self.counters).get())
+
+    def test_stale_instance_save(self):
+        book = Book.objects.create(
+            title='Book', author='A', price=Decimal('10.00'), condition='used', description='...',
+            seller=self.seller,
+        )
+        loaded = Book.objects.get(pk=book.pk)
+        self.assertFalse(hasattr(loaded, '_stats_snapshot'))
+        loaded.is_approved = True
+        loaded.save()
+        self.assertStatsMatchTables()
+        # `book` still holds the pending state and writes it back
+        book.title = 'Renamed'
+        book.save()
+        self.assertStatsMatchTables()
+        self.assertEqual(SiteStats.objects.get().pending_books, 1)
+
+    def test_sales_figures_are_admin_only(self):
+        response = APIClient().get('/api/admin-reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('revenue', response.data)
+        self.assertNotIn('total_orders', response.data)
+        self.assertNotIn('sold', response.data['books_breakdown'])
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', password='pass', role='admin', is_staff=True))
+        response = client.get('/api/admin-reports/')
+        self.assertEqual((response.data['revenue'], response.data['total_orders']), ('0.00', 0))
+
+    def test_uncounted_update_fields_skip_the_lookup(self):
+        with self.assertNumQueries(1):
+            self.seller.save(update_fields=['last_login'])
+        with self.assertNumQueries(3):
+            # Lookup, UPDATE of the user, UPDATE of the counters
+            self.seller.is_active = False
+            self.seller.save(update_fields=['is_active'])
+        self.assertStatsMatchTables()
+
+
+@override_settings(NOTIFICATION_OUTBOX={'IN_PROCESS_WORKER': False, 'MAX_ATTEMPTS': 2})
+class OutboxTests(TestCase):
+    """
+    Workers claim disjoint batches and deliver each user's notifications in
+    order; failing rows are retried one by one and dead-lettered after
+    MAX_ATTEMPTS.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pass')
+
+    def enqueue(self, *messages, user=None):
+        return [outbox.enqueue(((user or self.user).id, message)).id for message in messages]
+
+    def test_claims_do_not_overlap(self):
+        ids = [
+            self.enqueue(str(i), user=User.objects.create_user(f'user{i}', password='pass'))[0]
+            for i in range(3)
+        ]
+        first = outbox.claim(2, 2)
+        second = outbox.claim(2, 2)
+        self.assertEqual([row.id for row in first], ids[:2])
+        self.assertEqual([row.id for row in second], ids[2:])
+        self.assertEqual(outbox.claim(2, 2), [])
+
+    def test_later_rows_wait_for_the_users_older_rows(self):
+        other = User.objects.create_user('other', password='pass')
+        first, second = self.enqueue('a', 'b')
+        others = self.enqueue('c', user=other)
+        self.assertEqual([row.id for row in outbox.claim(1, 2)], [first])
+        # `second` would overtake `first` if another worker delivered it now
+        self.assertEqual([row.id for row in outbox.claim(10, 2)], others)
+        NotificationOutbox.objects.filter(pk=first).update(available_at=timezone.now())
+        self.assertEqual([row.id for row in outbox.claim(10, 2)], [first, second])
+
+    def test_notifications_keep_the_event_time(self):
+        self.enqueue('a')
+        recorded = timezone.now() - datetime.timedelta(minutes=5)
+        NotificationOutbox.objects.update(created_at=recorded)
+        outbox.drain()
+        self.assertEqual(Notification.objects.get().created_at, recorded)
+
+    def test_expired_claim_is_not_delivered_twice(self):
+        self.enqueue('a')
+        rows = outbox.claim(10, 2)
+        # The claim expired and another worker took the row
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        with self.assertRaises(outbox.ClaimLost):
+            with transaction.atomic():
+                outbox.deliver(rows)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+
+    def test_bad_row_is_retried_then_dead_lettered(self):
+        other = User.objects.create_user('other', password='pass')
+        self.enqueue('before')
+        bad = NotificationOutbox.objects.create(payload=[{'user': self.user.id}]).id
+        after = self.enqueue('after')[0]
+        self.enqueue('unrelated', user=other)
+
+        with self.assertLogs('core.outbox', 'ERROR'):
+            self.assertEqual(outbox.drain(), 2)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('message', flat=True)), ['before', 'unrelated']
+        )
+        row = NotificationOutbox.objects.get(pk=bad)
+        self.assertEqual(row.attempts, 1)
+        self.assertIn('KeyError', row.last_error)
+        self.assertGreater(row.available_at, timezone.now())
+        # 'after' waits for the retry of the row before it
+        self.assertEqual(outbox.claim(10, 2), [])
+
+        NotificationOutbox.objects.filter(pk=bad).update(available_at=timezone.now())
+        with self.assertLogs('core.outbox', 'ERROR'):
+            outbox.drain()
+        row.refresh_from_db()
+        self.assertEqual(row.attempts, 2)
+        # Dead-lettered: never picked up again, and no longer holds up 'after'
+        self.assertFalse(NotificationOutbox.objects.filter(pk=after).exists())
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.claim(10, 2), [])
+
+
+class MetricsTests(TestCase):
+    """
+    MetricsMiddleware records requests under their route name and
+    /metrics exposes them, added up across processes in multiprocess mode.
+    """
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.buyer = User.objects.create_user('buyer', password='pass', role='buyer')
+        seed_rows(User.objects.create_user('seller', password='pass', role='seller'), self.buyer, 5)
+
+    def scrape(self):
+        self.client.force_login(User.objects.get_or_create(username='staff', is_staff=True)[0])
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_records_route_status_queries_and_size(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        client.get('/api/notifications/')
+        client.get('/api/notifications/')
+        client.get('/api/orders/999999/')
+        client.get('/no-such-page/')
+
+        text = self.scrape()
+        route = 'route="notification-list",method="GET"'
+        self.assertIn(f'bookmarket_http_request_duration_seconds_count{{{route}}} 2', text)
+        self.assertIn(f'bookmarket_http_responses_total{{{route},status="200"}} 2', text)
+        self.assertIn('bookmarket_http_responses_total{route="order-detail",method="GET",status="404"} 1', text)
+        self.assertIn('bookmarket_http_responses_total{route="unresolved",method="GET",status="404"} 1', text)
+        # The list query (force_authenticate skips the user lookup)
+        self.assertIn(f'bookmarket_http_db_queries_bucket{{{route},le="1"}} 2', text)
+        self.assertIn(f'bookmarket_http_db_queries_bucket{{{route},le="0"}} 0', text)
+        size = next(line for line in text.splitlines() if line.startswith(f'bookmarket_http_response_size_bytes_sum{{{route}}}'))
+        self.assertGreater(int(size.split()[-1]), 0)
+
+    def test_streamed_response_recorded_after_last_chunk(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = client.get('/api/profile/history/?format=ndjson')
+        body = b''.join(response.streaming_content)
+        text = self.scrape()
+        self.assertIn(f'bookmarket_http_response_size_bytes_sum{{route="user-history",method="GET"}} {len(body)}', text)
+
+    def test_multiprocess_mode_adds_up_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS={'MULTIPROCESS_DIR': directory}):
+            # Another worker's aggregates
+            other = metrics.Registry()
+            other.record('book-list', 'GET', 200, 0.2, 1, 100)
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                histograms, responses = other.snapshot()
+                json.dump({'histograms': histograms, 'responses': responses}, f)
+
+            metrics.registry.record('book-list', 'GET', 200, 0.02, 1, 300)
+            text = self.scrape()
+
+        route = 'route="book-list",method="GET"'
+        self.assertIn(f'bookmarket_http_responses_total{{{route},status="200"}} 2', text)
+        self.assertIn(f'bookmarket_http_request_duration_seconds_bucket{{{route},le="0.025"}} 1', text)
+        self.assertIn(f'bookmarket_http_request_duration_seconds_bucket{{{route},le="0.25"}} 2', text)
+        self.assertIn(f'bookmarket_http_response_size_bytes_sum{{{route}}} 400', text)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('BREW', 'PROPFIND', 'X-RANDOM-1'):
+            self.client.generic(method, '/api/books/')
+        text = self.scrape()
+        self.assertIn('bookmarket_http_request_duration_seconds_count{route="book-list",method="other"} 3', text)
+        self.assertNotIn('BREW', text)
+
+    def test_private_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS={'PUBLIC': True}):
+            self.client.logout()
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @override_settings(METRICS={'TOKEN': 'scrape-secret'})
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(TestCase):
+    """
+    Catalogue search must return the matching books, whichever migrations
+    or model writes they went through.
+    """
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.django_book = Book.objects.create(
+            title='Two Scoops of Django', author='Greenfeld', price=Decimal('10.00'),
+            condition='new', description='...', seller=seller, is_approved=True,
+        )
+        Book.objects.create(
+            title='Fluent Python', author='Ramalho', price=Decimal('10.00'),
+            condition='new', description='...', seller=seller, is_approved=True,
+        )
+
+    def search(self, term):
+        response = APIClient().get('/api/books/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [book['id'] for book in response.data['results']]
+
+    def test_search_returns_matching_book(self):
+        self.assertEqual(self.search('django'), [self.django_book.id])
+        self.assertEqual(self.search('greenf'), [self.django_book.id])
+        self.assertEqual(self.search('nothing-like-this'), [])
+
+    def test_search_follows_title_updates(self):
+        self.django_book.title = 'Two Scoops of Flask'
+        self.django_book.save()
+        cache.clear()
+        self.assertEqual(self.search('django'), [])
+        self.assertEqual(self.search('flask'), [self.django_book.id])
+
+    def test_best_match_first(self):
+        seller = self.django_book.seller
+        # Newer, so recency alone would list it first
+        mention = Book.objects.create(
+            title='Web Development with Python: Flask, Pyramid, Django and Friends', author='Various',
+            price=Decimal('10.00'), condition='new', description='...', seller=seller, is_approved=True,
+        )
+        self.assertEqual(self.search('django'), [self.django_book.id, mention.id])
+        # Every term has to match
+        self.assertEqual(self.search('django flask'), [mention.id])
+        # An explicit ordering replaces the relevance order
+        response = APIClient().get('/api/books/', {'search': 'django', 'ordering': '-title'})
+        self.assertEqual([book['id'] for book in response.data['results']], [mention.id, self.django_book.id])
+
+    def test_index_and_triggers_exist(self):
+        # Fails when a migration rebuilt core_book and dropped the triggers
+        self.assertEqual(search.missing_fts_objects('default'), [])
+
+    def test_migrate_restores_dropped_triggers(self):
+        with connection.cursor() as cursor:
+            for trigger in search.FTS_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {trigger}')
+        Book.objects.filter(pk=self.django_book.pk).update(title='Two Scoops of Flask')
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        self.assertEqual(search.missing_fts_objects('default'), [])
+        cache.clear()
+        self.assertEqual(self.search('flask'), [self.django_book.id])
+        self.assertEqual(self.search('django'), [])
+
+    @override_settings(BOOK_SEARCH_BACKEND='core.search.BasicSearchBackend')
+    def test_basic_backend_matches_the_same_books(self):
+        self.assertEqual(self.search('django'), [self.django_book.id])
+        self.assertEqual(self.search('ramalho'), [Book.objects.get(author='Ramalho').id])
+
+
+class CatalogueCacheTests(TestCase):
+    """
+    Catalogue pages and the category map must follow writes, and their
+    version stamps must live in a cache every worker can see.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category_map.invalidate()
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.book = Book.objects.create(
+            title='Dune', author='Herbert', price=Decimal('10.00'), condition='used', description='...',
+            seller=self.seller, is_approved=True, status='available',
+        )
+
+    def get_books(self):
+        response = APIClient().get('/api/books/')
+        return response['X-Cache'], [(book['title'], book['status']) for book in response.data['results']]
+
+    def test_book_writes_invalidate_pages(self):
+        self.assertEqual(self.get_books(), ('MISS', [('Dune', 'available')]))
+        self.assertEqual(self.get_books(), ('HIT', [('Dune', 'available')]))
+
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+        self.assertEqual(self.get_books(), ('MISS', [('Dune Messiah', 'available')]))
+
+        # Checkout flips the status with an UPDATE, bypassing the signals
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_book(self.book.pk)
+        self.assertEqual(self.get_books(), ('MISS', [('Dune Messiah', 'sold')]))
+
+    def test_stale_page_served_while_another_worker_rebuilds(self):
+        self.get_books()
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+        # Another worker holds the refresh lock for this page
+        key = catalogue_cache.make_key(Request(RequestFactory().get('/api/books/')))
+        catalogue_cache.cache.add(key + ':lock', 1)
+        self.assertEqual(self.get_books(), ('STALE', [('Dune', 'available')]))
+
+    def test_categories_served_from_the_map(self):
+        Category.objects.create(name='Fiction')
+        APIClient().get('/api/categories/')
+        with self.assertNumQueries(0):
+            response = APIClient().get('/api/categories/')
+        self.assertEqual([category['name'] for category in response.data], ['Fiction'])
+
+    def test_category_change_in_another_worker(self):
+        category = Category.objects.create(name='Fiction')
+        self.assertEqual(category_map.name_for(category.id), 'Fiction')
+        # Another worker renamed it: only the shared stamp moved
+        Category.objects.filter(pk=category.pk).update(name='Novels')
+        category_map.cache.incr(category_map.version_key)
+        self.assertEqual(category_map.name_for(category.id), 'Fiction')
+        with mock.patch.object(category_map, 'check_interval', 0):
+            self.assertEqual(category_map.name_for(category.id), 'Novels')
+        # Created elsewhere after our last check: reloaded on the miss
+        created = Category.objects.bulk_create([Category(name='Poetry')])[0]
+        self.assertEqual(category_map.name_for(created.id), 'Poetry')
+
+    @override_settings(REQUIRE_SHARED_CACHE=True)
+    def test_process_local_cache_refused(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, 'CATALOGUE_CACHE'):
+            check_shared_caches()
+
+    @override_settings(REQUIRE_SHARED_CACHE=True, CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()},
+    })
+    def test_shared_cache_accepted(self):
+        check_shared_caches()
+
+
+class BulkImportTests(TestCase):
+    """
+    CSV and NDJSON uploads to my-inventory create pending books in chunks
+    and report the rows they reject by line number.
+    """
+
+    def setUp(self):
+        cache.clear()
+        category_map.invalidate()
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.category = Category.objects.create(name='Fiction')
+        stats.reconcile()
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def test_csv_body(self):
+        body = (
+            'title,author,category,price,condition,description\n'
+            f'Dune,Herbert,{self.category.id},10.00,used,Sand\n'
+            'Emma,Austen,,not-a-price,new,Bath\n'
+            'Ubik,Dick,999999,5.00,new,Odd\n'
+        )
+        response = self.client.generic('POST', '/api/books/my-inventory/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertIn('category', response.data['errors'][1]['errors'])
+        book = Book.objects.get(title='Dune')
+        self.assertEqual((book.seller, book.category, book.status, book.is_approved), (self.seller, self.category, 'pending', False))
+        self.assertEqual(SiteStats.objects.get().pending_books, 1)
+
+    def test_ndjson_file_upload(self):
+        lines = [json.dumps({'title': f'Book {i}', 'author': 'A', 'price': '3.00', 'condition': 'new', 'description': '.'}) for i in range(3)]
+        upload = ContentFile(('\n'.join(lines[:2] + ['not json'] + lines[2:]) + '\n').encode(), name='books.ndjson')
+        response = self.client.post('/api/books/my-inventory/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 3)
+        self.assertEqual(Book.objects.filter(seller=self.seller).count(), 3)
+
+    def test_one_insert_per_chunk(self):
+        lines = [
+            json.dumps({'title': f'Book {i}', 'author': 'A', 'price': '3.00', 'condition': 'new', 'description': '.'}).encode()
+            for i in range(5)
+        ]
+        with mock.patch.object(Book.objects, 'bulk_create', wraps=Book.objects.bulk_create) as bulk_create:
+            report = bulk_import.import_books('ndjson', iter(lines), self.seller, chunk_size=2)
+        self.assertEqual(report['created'], 5)
+        self.assertEqual([len(call.args[0]) for call in bulk_create.call_args_list], [2, 2, 1])
+
+    def test_nothing_valid_is_a_bad_request(self):
+        response = self.client.generic('POST', '/api/books/my-inventory/', 'title\n\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+
+class BasicAuthCacheTests(TestCase):
+    """
+    Repeated Basic auth logins skip the password hasher, but a password
+    change or deactivation is honoured on the next request.
+    """
+    url = '/api/notifications/unread-count/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='old-pass')
+        self.client = APIClient()
+
+    def get(self, password):
+        credentials = base64.b64encode(f'buyer:{password}'.encode()).decode()
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Basic {credentials}').status_code
+
+    def hasher_calls(self):
+        return mock.patch.object(base_user, 'check_password', wraps=base_user.check_password)
+
+    def test_hasher_runs_once(self):
+        with self.hasher_calls() as check_password:
+            self.assertEqual([self.get('old-pass') for _ in range(3)], [200, 200, 200])
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_failed_logins_are_not_cached(self):
+        with self.hasher_calls() as check_password:
+            self.assertEqual([self.get('wrong') for _ in range(2)], [401, 401])
+        self.assertEqual(check_password.call_count, 2)
+
+    def test_password_change(self):
+        self.assertEqual(self.get('old-pass'), 200)
+        self.user.set_password('new-pass')
+        self.user.save()
+        self.assertEqual(self.get('old-pass'), 401)
+        self.assertEqual(self.get('new-pass'), 200)
+
+    def test_deactivation(self):
+        self.assertEqual(self.get('old-pass'), 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get('old-pass'), 401)
+
+
+class HistoryTests(TestCase):
+    """
+    Every section of /api/profile/history/ pages with its own cursor, and
+    ?format=ndjson streams the whole history.
+    """
+    url = '/api/profile/history/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('seller', password='pass', role='seller')
+        other = User.objects.create_user('other', password='pass', role='seller')
+        seed_rows(self.user, other, 3)
+        # Books the user bought from `other`
+        books = Book.objects.bulk_create([
+            Book(
+                title=f'Bought {i}', author='A', price=Decimal('5.00'), condition='used', description='...',
+                seller=other, is_approved=True, status='sold',
+            )
+            for i in range(3)
+        ])
+        Order.objects.bulk_create([Order(book=book, buyer=self.user, status='paid') for book in books])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, page):
+        return [row['book_title'] for row in page['results']]
+
+    def test_sections_page_independently(self):
+        first = self.client.get(self.url, {'page_size': 2}).data
+        self.assertEqual(self.titles(first['purchases']), ['Bought 2', 'Bought 1'])
+        self.assertEqual(self.titles(first['sales']), ['Book 2', 'Book 1'])
+
+        # Following the purchases link keeps the sales section where it was
+        second = self.client.get(first['purchases']['next']).data
+        self.assertEqual(self.titles(second['purchases']), ['Bought 0'])
+        self.assertIsNone(second['purchases']['next'])
+        self.assertEqual(self.titles(second['sales']), ['Book 2', 'Book 1'])
+        third = self.client.get(second['sales']['next']).data
+        self.assertEqual(self.titles(third['sales']), ['Book 0'])
+        self.assertEqual(self.titles(third['purchases']), ['Bought 0'])
+
+    def test_single_section(self):
+        response = self.client.get(self.url, {'section': 'sales'})
+        self.assertEqual(list(response.data), ['sales'])
+        self.assertEqual(self.client.get(self.url, {'section': 'refunds'}).status_code, 400)
+
+    def test_ndjson_streams_everything(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(row['section'], row['book_title']) for row in rows],
+            [('purchases', f'Bought {i}') for i in (2, 1, 0)] + [('sales', f'Book {i}') for i in (2, 1, 0)],
+        )
+
+
+class AdminExportTests(TestCase):
+    """
+    /api/admin-exports/<dataset>/ streams CSV or NDJSON to admins,
+    filtered by day range and status.
+    """
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        seed_rows(self.seller, self.buyer, 3)
+        self.admin = User.objects.create_user('admin', password='pass', role='admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self, dataset, **params):
+        response = self.client.get(f'/api/admin-exports/{dataset}/', params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_orders_csv(self):
+        response, body = self.export('orders')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['book_title'] for row in rows], ['Book 0', 'Book 1', 'Book 2'])
+        self.assertEqual(
+            (rows[0]['price'], rows[0]['buyer_name'], rows[0]['seller_name'], rows[0]['status']),
+            ('10.00', 'buyer', 'seller', 'paid'),
+        )
+
+    def test_formulas_are_neutralised(self):
+        Book.objects.filter(title='Book 0').update(title='=HYPERLINK("http://x")')
+        Book.objects.filter(title='Book 1').update(title='-2+3')
+        _, body = self.export('books')
+        titles = [row['title'] for row in csv.DictReader(io.StringIO(body))]
+        self.assertEqual(titles, ['\'=HYPERLINK("http://x")', "'-2+3", 'Book 2'])
+        rows = list(csv.DictReader(io.StringIO(self.export('orders')[1])))
+        self.assertEqual(rows[0]['price'], '10.00')
+
+    def test_transactions_ndjson(self):
+        _, body = self.export('transactions', format='ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual((rows[0]['amount'], rows[0]['buyer_name']), ('10.00', 'buyer'))
+
+    def test_filters(self):
+        old = Order.objects.order_by('id').first()
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(days=10))
+        Order.objects.filter(pk=Order.objects.order_by('id').last().pk).update(status='shipped')
+        today = timezone.localdate().isoformat()
+        _, body = self.export('orders', start=today, end=today, status='paid', format='ndjson')
+        self.assertEqual([json.loads(line)['book_title'] for line in body.splitlines()], ['Book 1'])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get('/api/admin-exports/users/').status_code, 400)
+        self.assertEqual(self.client.get('/api/admin-exports/orders/', {'status': 'lost'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/admin-exports/orders/', {'start': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/admin-exports/orders/', {'end': '9999-12-31'}).status_code, 200)
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get('/api/admin-exports/orders/').status_code, 403)
+
+
+class JWTAuthenticationTests(TestCase):
+    """
+    CachedJWTAuthentication may skip the user query for regular users, but
+    demotions, deactivations and password changes must apply at once, even
+    when they bypass the signals that stamp the change.
+    """
+
+    def setUp(self):
+        cache.clear()
+        user_cache.rows.clear()
+        self.admin = User.objects.create_user('admin', password='pass', role='admin', is_staff=True)
+        self.buyer = User.objects.create_user('buyer', password='pass', role='buyer')
+
+    def client_for(self, username, password='pass'):
+        response = APIClient().post('/api/token/', {'username': username, 'password': password}, format='json')
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client
+
+    def test_demoted_admin_loses_access(self):
+        client = self.client_for('admin')
+        self.assertEqual(client.get('/api/users/').status_code, 200)
+        # update() skips the signals, so no change stamp: the admin claims
+        # in the token must not be trusted on their own
+        User.objects.filter(pk=self.admin.pk).update(is_staff=False, role='buyer')
+        self.assertEqual(client.get('/api/users/').status_code, 403)
+
+    def test_deactivated_user_rejected(self):
+        client = self.client_for('buyer')
+        self.assertEqual(client.get('/api/notifications/').status_code, 200)
+        self.buyer.is_active = False
+        self.buyer.save()
+        self.assertEqual(client.get('/api/notifications/').status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        client = self.client_for('buyer')
+        self.assertEqual(client.get('/api/notifications/').status_code, 200)
+        self.buyer.set_password('new-pass')
+        self.buyer.save()
+        self.assertEqual(client.get('/api/notifications/').status_code, 401)
+        self.assertEqual(self.client_for('buyer', 'new-pass').get('/api/notifications/').status_code, 200)
+
+    def test_regular_user_skips_user_query(self):
+        client = self.client_for('buyer')
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/notifications/unread-count/').status_code, 200)
+
+    def test_cached_rows_expire(self):
+        client = self.client_for('buyer')
+        user_cache.get(self.buyer.pk)
+        User.objects.filter(pk=self.buyer.pk).update(is_active=False)
+        self.assertEqual(client.get('/api/notifications/').status_code, 200)
+        with mock.patch.object(user_cache, 'ttl', 0):
+            self.assertEqual(client.get('/api/notifications/').status_code, 401)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """
+    Accept-Encoding negotiation, the types and sizes that are left alone,
+    and streaming that still compresses well.
+    """
+    body = b'{"title": "Clean Code", "author": "Robert Martin"}' * 40
+
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None, **headers):
+        response = HttpResponse(self.body if body is None else body, content_type='application/json')
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def test_gzip_negotiated(self):
+        response = self.respond(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(zlib.decompress(response.content, 31), self.body)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_q_values_respected(self):
+        self.assertFalse(self.respond(self.json_response(), 'gzip;q=0, identity').has_header('Content-Encoding'))
+        self.assertEqual(self.respond(self.json_response(), '*;q=0.5')['Content-Encoding'], 'gzip')
+        self.assertFalse(self.respond(self.json_response(), 'compress').has_header('Content-Encoding'))
+
+    def test_small_responses_left_alone(self):
+        response = self.respond(self.json_response(b'{"ok": true}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_html_and_partial_responses_left_alone(self):
+        html = HttpResponse(b'<p>csrf</p>' * 200, content_type='text/html')
+        self.assertFalse(self.respond(html).has_header('Content-Encoding'))
+        partial = self.json_response()
+        partial.status_code = 206
+        self.assertFalse(self.respond(partial).has_header('Content-Encoding'))
+
+    def test_strong_etag_weakened(self):
+        response = self.respond(self.json_response(ETag='"abc"'))
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_stream_not_flushed_per_chunk(self):
+        rows = [b'{"id": %d, "title": "Clean Code", "status": "paid"}\n' % i for i in range(2000)]
+        response = self.respond(StreamingHttpResponse(iter(rows), content_type='application/x-ndjson'))
+        compressed = list(response.streaming_content)
+        self.assertEqual(zlib.decompress(b''.join(compressed), 31), b''.join(rows))
+        # A sync flush per row would cost more than the row itself
+        self.assertLess(len(b''.join(compressed)), len(b''.join(rows)) / 10)
+
+
+@override_settings(DATABASE_REPLICAS={
+    'ALIASES': {'replica': 1}, 'MODELS': ('core.Book',), 'STICKY_SECONDS': 5, 'CACHE_ALIAS': 'default',
+})
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Safe-method requests read the listed models from a replica, unless the
+    client wrote something in the last STICKY_SECONDS.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.router = db_routers.ReplicaRouter()
+
+    def read_alias(self, method='get', status=200, **headers):
+        """
+        Send a request through the middleware and return where its Book
+        reads went.
+        """
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Book))
+            return HttpResponse(status=status)
+
+        request = getattr(RequestFactory(), method)('/', **headers)
+        ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_router(self):
+        self.assertIsNone(self.router.db_for_read(Book))
+        token = db_routers.activate('replica')
+        try:
+            self.assertEqual(self.router.db_for_read(Book), 'replica')
+            self.assertIsNone(self.router.db_for_read(Order))
+            self.assertEqual(self.router.db_for_write(Book), 'default')
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                self.assertIsNone(self.router.db_for_read(Book))
+        finally:
+            db_routers.deactivate(token)
+        self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_catalogue_pages_built_from_the_primary(self):
+        seen = []
+
+        def build():
+            seen.append(self.router.db_for_read(Book))
+            return Response({'results': []})
+
+        token = db_routers.activate('replica')
+        try:
+            catalogue_cache.get_or_build(Request(RequestFactory().get('/api/books/')), build)
+            self.assertEqual(self.router.db_for_read(Book), 'replica')
+        finally:
+            db_routers.deactivate(token)
+        self.assertEqual(seen, [None])
+
+    def test_read_your_writes(self):
+        alice, bob = {'HTTP_AUTHORIZATION': 'Bearer alice'}, {'HTTP_AUTHORIZATION': 'Bearer bob'}
+        self.assertEqual(self.read_alias(**alice), 'replica')
+        self.assertIsNone(self.read_alias('post', status=201, **alice))
+        self.assertIsNone(self.read_alias(**alice))
+        self.assertEqual(self.read_alias(**bob), 'replica')
+        # A failed write changes nothing, so it does not pin
+        self.read_alias('post', status=400, **bob)
+        self.assertEqual(self.read_alias(**bob), 'replica')
+
+    def test_pin_expires(self):
+        alice = {'HTTP_AUTHORIZATION': 'Bearer alice'}
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.read_alias('post', **alice)
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], 5)
+
+
+class ImageVariantTests(TestCase):
+    """
+    Replacing a cover deletes the previous cover's variant files, except
+    the ones another book with the same cover still uses.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+
+    def cover(self, color):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='cover.png')
+
+    def book_with_cover(self, color):
+        book = Book.objects.create(
+            title='Book', author='A', price=Decimal('10.00'), condition='used', description='...',
+            seller=self.seller, image=self.cover(color),
+        )
+        images.generate_variants(book.pk)
+        book.refresh_from_db()
+        return book
+
+    def test_replaced_cover_variants_are_deleted(self):
+        book = self.book_with_cover('red')
+        shared = self.book_with_cover('red')
+        old = images.stored_names(book.image_variants)
+        self.assertEqual(old, images.stored_names(shared.image_variants))
+
+        book.image = self.cover('blue')
+        book.save()
+        images.generate_variants(book.pk)
+        book.refresh_from_db()
+        new = images.stored_names(book.image_variants)
+        self.assertTrue(new and not new & old)
+        # Still used by the other book
+        self.assertTrue(all(default_storage.exists(name) for name in old | new))
+
+        shared.image = self.cover('green')
+        shared.save()
+        images.generate_variants(shared.pk)
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        self.assertTrue(all(default_storage.exists(name) for name in new))
+
+
+class MediaRangeTests(SimpleTestCase):
+    """
+    serve_media answers a satisfiable range with 206, an unsatisfiable one
+    with 416 and ignores an invalid one (full body, 200). Validators that
+    still match get a 304.
+    """
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with open(os.path.join(media_root.name, 'notes.txt'), 'wb') as f:
+            f.write(b'0123456789')
+
+    def get(self, byte_range):
+        response = self.client.get('/media/notes.txt', HTTP_RANGE=byte_range)
+        return response.status_code, response.getvalue()
+
+    def test_ranges(self):
+        self.assertEqual(self.get('bytes=2-5'), (206, b'2345'))
+        self.assertEqual(self.get('bytes=-3'), (206, b'789'))
+        self.assertEqual(self.get('bytes=8-20'), (206, b'89'))
+        self.assertEqual(self.get('bytes=20-'), (416, b''))
+        self.assertEqual(self.get('bytes=5-2'), (200, b'0123456789'))
+        self.assertEqual(self.get('bytes=0-1,4-5'), (200, b'0123456789'))
+
+    def test_suffix_range_of_an_empty_file(self):
+        open(os.path.join(settings.MEDIA_ROOT, 'empty.txt'), 'wb').close()
+        response = self.client.get('/media/empty.txt', HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_get(self):
+        etag = self.client.get('/media/notes.txt')['ETag']
+        response = self.client.get('/media/notes.txt', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+        # Compression middleware downstream weakens the tag
+        self.assertEqual(self.client.get('/media/notes.txt', HTTP_IF_NONE_MATCH=f'"x", W/{etag}').status_code, 304)
+        self.assertEqual(self.client.get('/media/notes.txt', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        # If-None-Match wins over If-Modified-Since
+        last_modified = self.client.get('/media/notes.txt')['Last-Modified']
+        self.assertEqual(self.client.get('/media/notes.txt', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        response = self.client.get('/media/notes.txt', HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """
+    ORJSONRenderer writes the same bytes as DRF's JSONRenderer.
+    """
+
+    def assertSameBytes(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_same_bytes(self):
+        tz = datetime.timezone(datetime.timedelta(hours=3, minutes=30))
+        self.assertSameBytes({
+            'decimal': Decimal('10.50'),
+            'datetime': datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'offset': datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=tz),
+            'naive': datetime.datetime(2026, 1, 2, 3, 4, 5, 678901),
+            'date': datetime.date(2026, 1, 2),
+            'time': datetime.time(3, 4, 5, 678901),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'text': 'line\u2028separator\u2029paragraph, کتاب',
+            'nested': [{'price': 1.5, 'missing': None}],
+        })
+
+    def test_non_str_keys(self):
+        self.assertSameBytes({1: 'a', 2.5: 'b', True: 'c', None: 'd'})
+
+    def test_non_finite_numbers_are_rejected(self):
+        for value in (float('nan'), float('inf'), -float('inf'), Decimal('NaN')):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                ORJSONRenderer().render({'rows': [{'value': value}]})
+
+
+class NotificationCounterTests(TestCase):
+    """
+    The unread counter and the bulk mark-read endpoints only ever see the
+    current user's notifications.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', password='pass')
+        self.other = User.objects.create_user('other', password='pass')
+        self.mine = [Notification.objects.create(user=self.user, message=f'n{i}').id for i in range(3)]
+        self.theirs = Notification.objects.create(user=self.other, message='theirs').id
+        Notification.objects.create(user=self.user, message='read', is_read=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    def test_mark_read_ignores_foreign_ids(self):
+        self.assertEqual(self.unread_count(), 3)
+        response = self.client.post(
+            '/api/notifications/mark-read/', {'ids': [self.mine[0], self.theirs]}, format='json'
+        )
+        self.assertEqual(response.data, {'marked_as_read': 1, 'unread_count': 2})
+        self.assertFalse(Notification.objects.get(pk=self.theirs).is_read)
+
+    def test_mark_all_read(self):
+        response = self.client.post('/api/notifications/mark-all-read/')
+        self.assertEqual(response.data['marked_as_read'], 3)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.get(pk=self.theirs).is_read)
+
+
+class ModerationTests(TestCase):
+    """
+    Batch moderation only accepts a list of ids and notifies each seller
+    once per actual change.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user('seller', password='pass', role='seller')
+        self.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='A', price=Decimal('10.00'), condition='used',
+                description='...', seller=self.seller,
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', password='pass', is_staff=True, role='admin'))
+
+    def test_scalar_ids_rejected(self):
+        ids = f'{self.books[0].id}{self.books[1].id}'
+        response = self.client.post('/api/books/moderate/', {'action': 'approve', 'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.filter(is_approved=True).exists())
+
+    def test_form_encoded_list(self):
+        ids = [self.books[0].id, self.books[2].id]
+        response = self.client.post('/api/books/moderate/', {'action': 'approve', 'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(Book.objects.filter(is_approved=True).values_list('id', flat=True)), set(ids))
+
+    def test_repeated_approval_notifies_once(self):
+        body = {'action': 'approve', 'ids': [book.id for book in self.books]}
+        self.assertEqual(self.client.post('/api/books/moderate/', body, format='json').data['changed'], 3)
+        response = self.client.post('/api/books/moderate/', body, format='json')
+        self.assertEqual(response.data['changed'], 0)
+        self.assertEqual(set(response.data['results'].values()), {'unchanged'})
+        self.assertEqual(Notification.objects.filter(user=self.seller).count(), 3)
+
+    def test_filter_batch(self):
+        Book.objects.filter(pk=self.books[0].pk).update(condition='new')
+        with mock.patch.object(moderation, 'CHUNK_SIZE', 1):
+            response = self.client.post('/api/books/moderate/?status=pending&condition=used', {'action': 'approve'}, format='json')
+        self.assertEqual(response.data['changed'], 2)
+        self.assertEqual(
+            set(Book.objects.filter(is_approved=True).values_list('id', flat=True)),
+            {self.books[1].id, self.books[2].id},
+        )
+        self.assertEqual(SiteStats.objects.get().pending_books, 1)
+
+    def test_filter_batch_needs_a_known_filter(self):
+        for query in ('?stauts=pending', '?format=json', '?status=pending&categroy=2', '?price__gte=cheap', '?search='):
+            response = self.client.post(f'/api/books/moderate/{query}', {'action': 'approve'}, format='json')
+            self.assertEqual(response.status_code, 400, query)
+        self.assertFalse(Book.objects.filter(is_approved=True).exists())
+
+    def test_mark_read_rejects_scalar_body(self):
+        notification = Notification.objects.create(user=self.seller, message='hi')
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        self.assertEqual(client.post('/api/notifications/mark-read/', {'ids': '1'}, format='json').status_code, 400)
+        response = client.post(f'/api/notifications/mark-read/?ids={notification.id}')
+        self.assertEqual(response.data['marked_as_read'], 1)
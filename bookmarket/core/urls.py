@@ -4,7 +4,8 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 # اضافه کردن ویوهای جدید به import
 from .views import (
     AdminReportView, CategoryViewSet, FavoriteViewSet, RegisterView, SupportTicketViewSet, TransactionViewSet, UserActivityHistoryView, UserProfileView, UserViewSet, BookViewSet, 
-    OrderViewSet, NotificationViewSet, PasswordResetRequestView, PasswordResetConfirmView
+    OrderViewSet, NotificationViewSet, PasswordResetRequestView, PasswordResetConfirmView, SellerSalesView,
+    OrderHistoryView, AdminExportView
 )
 
 router = DefaultRouter()
@@ -26,5 +27,8 @@ urlpatterns = [
     path('password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('profile/history/', UserActivityHistoryView.as_view(), name='user-history'),
+    path('profile/orders/', OrderHistoryView.as_view(), name='order-history'),
     path('admin-reports/', AdminReportView.as_view(), name='admin-reports'),
+    path('admin-exports/<str:dataset>/', AdminExportView.as_view(), name='admin-exports'),
+    path('seller/sales/', SellerSalesView.as_view(), name='seller-sales'),
 ]
\ No newline at end of file
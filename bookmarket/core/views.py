@@ -1,14 +1,28 @@
 from rest_framework.exceptions import ValidationError
 from rest_framework import viewsets, permissions, filters
 from .models import Favorite, SupportTicket, Transaction, User, Book, Order, Notification,Category
-from .serializers import FavoriteSerializer, InvoiceSerializer, PasswordResetConfirmSerializer, PasswordResetRequestSerializer, SupportTicketSerializer, TransactionSerializer, UserSerializer, BookSerializer, OrderSerializer, NotificationSerializer,CategorySerializer
+from .serializers import FavoriteSerializer, IdListSerializer, InvoiceSerializer, PasswordResetConfirmSerializer, PasswordResetRequestSerializer, SupportTicketSerializer, TransactionSerializer, UserSerializer, BookSerializer, OrderSerializer, NotificationSerializer,CategorySerializer
 from django_filters.rest_framework import DjangoFilterBackend
 from .permissions import IsOwnerOrReadOnly, IsSellerOrAdmin
+from .search import BookSearchFilter
+from .pagination import CreatedAtCursorPagination
+from .querybudget import QueryBudgetMixin
+from .cache import catalogue_cache, category_map
+from .stats import get_stats
+from .purchase import PurchaseError, pay_order, purchase_book
+from . import bulk_import
+from .moderation import ModerationConflict, moderate_books
+from . import exports, history
+from .renderers import CSVRenderer, NDJSONRenderer
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .models import User
-from django.db.models import Q
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import datetime
 import random
 import uuid
 from rest_framework.decorators import action
@@ -45,16 +59,21 @@ class UserViewSet(viewsets.ModelViewSet):
             )
             
         user.role = new_role
-        user.save()
+        # Also drops the user from the token auth cache (see core/signals.py)
+        user.save(update_fields=['role'])
         return Response({'status': f'User role updated to {new_role}'})
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     # queryset = Book.objects.filter(is_approved=True).exclude(status='pending')
     serializer_class = BookSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # Serializing books may reload the category map once (+1 query)
+    query_budgets = {'list': 2, 'retrieve': 2, 'my_inventory': 2, 'approve': 5, 'reject': 5}
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, filters.OrderingFilter]
     filterset_fields = {
     'category': ['exact'],
     'condition': ['exact'],
     'status': ['exact'],
+    'is_approved': ['exact'],
     'price': ['gte', 'lte'],
     }
     search_fields = ['title', 'author']
@@ -82,6 +101,18 @@ class BookViewSet(viewsets.ModelViewSet):
         # 2. بقیه کاربران کتاب‌های تأیید شده را می‌بینند (چه موجود، چه فروخته شده)
         # فقط کتاب‌های pending (در انتظار تأیید) نمایش داده نمی‌شوند
         return Book.objects.filter(is_approved=True).exclude(status='pending').order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Non-admin catalogue pages are served from the catalogue cache.
+        Admins also see pending books, so they always hit the database.
+        """
+        user = request.user
+        if not user.is_anonymous and (user.is_staff or user.role == 'admin'):
+            return super().list(request, *args, **kwargs)
+        return catalogue_cache.get_or_build(
+            request, lambda: super(BookViewSet, self).list(request, *args, **kwargs)
+        )
     def perform_update(self, serializer):
         """
         When a seller updates a book, if they try to change the status,
@@ -129,6 +160,16 @@ class BookViewSet(viewsets.ModelViewSet):
         if user.role != 'seller' and not user.is_staff:
             return Response({"detail": "Only sellers can access inventory."}, status=403)
 
+        # --- Handle POST (Bulk import from CSV / NDJSON) ---
+        if request.method == 'POST':
+            fmt, lines = bulk_import.detect_format(request)
+            if fmt is not None:
+                # Cost grows with the number of chunks, not covered by the per-request budget
+                self.query_budget_exempt = True
+                report = bulk_import.import_books(fmt, lines, seller=user)
+                code = status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+                return Response(report, status=code)
+
         # --- Handle POST (Create Book) ---
         if request.method == 'POST':
             serializer = self.get_serializer(data=request.data)
@@ -138,7 +179,7 @@ class BookViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         # --- Handle GET (List My Books) ---
-        user_books = Book.objects.filter(seller=user).order_by('-created_at')
+        user_books = self.optimize_queryset(Book.objects.filter(seller=user).order_by('-created_at'))
         page = self.paginate_queryset(user_books)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -188,6 +229,52 @@ class BookViewSet(viewsets.ModelViewSet):
             'seller_notified': True
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser], url_path='moderate')
+    def moderate(self, request):
+        """
+        Batch approve/reject for Admin.
+        Body: {"action": "approve" | "reject", "ids": [1, 2, 3]}.
+        Without "ids", the books matched by the usual list filters in the
+        query string are moderated instead (e.g. ?status=pending&category=2).
+        Every query parameter must be one of those filters (or ?search=),
+        so a misspelt one cannot widen the batch to the whole catalogue.
+        """
+        decision = request.data.get('action')
+        if decision not in ('approve', 'reject'):
+            return Response({'error': "action must be 'approve' or 'reject'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = None
+        queryset = Book.objects.all()
+        if 'ids' in request.data:
+            serializer = IdListSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({'error': 'ids must be a list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+            ids = serializer.validated_data['ids']
+            queryset = queryset.filter(id__in=ids)
+        else:
+            filterset = DjangoFilterBackend().get_filterset(request, queryset, self)
+            search_param = api_settings.SEARCH_PARAM
+            known = {*filterset.filters, search_param, api_settings.URL_FORMAT_OVERRIDE}
+            unknown = sorted(set(request.query_params) - known)
+            if unknown:
+                return Response({'error': f"Unknown filter: {', '.join(unknown)}."}, status=status.HTTP_400_BAD_REQUEST)
+            if not any(request.query_params.get(name) for name in [*filterset.filters, search_param]):
+                return Response({'error': 'Please provide ids or a filter.'}, status=status.HTTP_400_BAD_REQUEST)
+            if not filterset.is_valid():
+                return Response({'error': filterset.errors}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = self.filter_queryset(queryset)
+
+        # Relevance ordering / select_related from the list filters are not needed here
+        try:
+            outcomes, changed = moderate_books(queryset.order_by(), decision, requested_ids=ids)
+        except ModerationConflict as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'action': decision,
+            'changed': changed,
+            'results': outcomes
+        }, status=status.HTTP_200_OK)
+
     
 class CategoryViewSet(viewsets.ModelViewSet):
     """
@@ -203,10 +290,16 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if self.request.method in permissions.SAFE_METHODS:
             return [permissions.AllowAny()]
         return [permissions.IsAdminUser()]
+
+    def list(self, request, *args, **kwargs):
+        # Served from the in-process category map, no database access
+        return Response(category_map.as_list())
     
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    query_budgets = {'list': 1, 'retrieve': 1, 'my_invoices': 1, 'create': 8, 'pay': 9}
+    pagination_class = CreatedAtCursorPagination
 
     def get_permissions(self):
         # اگر کاربر بخواهد سفارش را ببیند (retrieve)، تغییر دهد یا حذف کند
@@ -218,8 +311,13 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # ادمین همه را می‌بیند، کاربر معمولی فقط خریدهای خودش
         if self.request.user.is_staff or self.request.user.role == 'admin':
-            return Order.objects.all()
-        return Order.objects.filter(buyer=self.request.user)
+            queryset = Order.objects.all()
+        else:
+            queryset = Order.objects.filter(buyer=self.request.user)
+        if self.action == 'pay':
+            # pay_order reads the price and any earlier transaction
+            queryset = queryset.select_related('book', 'transaction')
+        return queryset
 
     # def perform_create(self, serializer):
     #     book = serializer.validated_data['book']
@@ -239,24 +337,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         book = serializer.validated_data['book']
         
-        # 1. بررسی وضعیت کتاب
-        if book.status == 'sold':
-            raise ValidationError("This book is already sold.")
-
-        # 2. ثبت سفارش با وضعیت پرداخت شده
-        order = serializer.save(buyer=self.request.user, status='paid')
-
-        # 3. ایجاد خودکار تراکنش (Transaction)
-        transaction = Transaction.objects.create(
-            order=order,
-            amount=book.price,
-            status='success',
-            ref_id=str(uuid.uuid4())[:8]
-        )
-
-        # 4. آپدیت وضعیت کتاب
-        book.status = 'sold'
-        book.save()
+        # 1-4. claim the book, create the paid order and its transaction atomically
+        # (a conditional UPDATE, so two concurrent buyers can never both win)
+        try:
+            order, transaction = purchase_book(book, self.request.user)
+        except PurchaseError as exc:
+            raise ValidationError(str(exc))
 
         # 5. برگرداندن فاکتور آنی
         return Response({
@@ -279,23 +365,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         if order.status == 'paid':
             return Response({'error': 'Order already paid'}, status=400)
 
-        # Simulating a successful transaction
-        transaction, created = Transaction.objects.get_or_create(
-            order=order,
-            defaults={'amount': order.book.price}
-        )
-        
-        # Update Transaction and Order
-        transaction.status = 'success'
-        transaction.ref_id = str(uuid.uuid4())[:8] # Generating a random tracking code
-        transaction.save()
-
-        order.status = 'paid'
-        order.save()
-
-        # Update Book Status to Sold
-        order.book.status = 'sold'
-        order.book.save()
+        # Simulating a successful transaction; order, book and transaction
+        # are updated in one atomic block (see core/purchase.py)
+        try:
+            transaction = pay_order(order)
+        except PurchaseError as exc:
+            return Response({'error': str(exc)}, status=400)
 
         return Response({
             'message': 'Payment successful',
@@ -305,7 +380,9 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='my-invoices')
     def my_invoices(self, request):
         # Only show paid orders for the logged-in user
-        user_invoices = Order.objects.filter(buyer=request.user, status='paid')
+        user_invoices = self.optimize_queryset(
+            Order.objects.filter(buyer=request.user, status='paid'), InvoiceSerializer
+        )
         serializer = InvoiceSerializer(user_invoices, many=True)
         return Response(serializer.data)
     
@@ -314,9 +391,11 @@ from rest_framework.decorators import action
 
 # core/views.py
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
+    query_budgets = {'list': 1, 'retrieve': 2, 'mark_as_read': 2, 'unread_count': 1, 'mark_all_read': 1, 'mark_read': 2}
+    pagination_class = CreatedAtCursorPagination
     
     def get_permissions(self):
         """
@@ -344,12 +423,49 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """
         notification = self.get_object()
         # Ensure users can only mark their own notifications
-        if notification.user != request.user and not request.user.is_staff:
+        if notification.user_id != request.user.id and not request.user.is_staff:
             return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
             
         notification.is_read = True
-        notification.save()
+        notification.save(update_fields=['is_read'])
         return Response({'status': 'notification marked as read'})
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Cheap badge counter, answered from the (user, is_read) index.
+        """
+        count = Notification.objects.filter(user=request.user, is_read=False).count()
+        return Response({'unread_count': count})
+
+    @action(detail=False, methods=['post'], url_path='mark-all-read')
+    def mark_all_read(self, request):
+        """
+        Marks every unread notification of the current user as read with a single UPDATE.
+        """
+        marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        return Response({'marked_as_read': marked, 'unread_count': 0})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """
+        Marks the given notifications as read with a single UPDATE.
+        IDs come from ?ids=1,2,3 or an "ids" list in the request body.
+        """
+        if request.query_params.get('ids'):
+            serializer = IdListSerializer(data={'ids': request.query_params['ids'].split(',')})
+        elif 'ids' in request.data:
+            serializer = IdListSerializer(data=request.data)
+        else:
+            return Response({'error': 'Please provide ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not serializer.is_valid():
+            return Response({'error': 'ids must be a list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data['ids']
+
+        # Scoped to the current user, so foreign ids are silently ignored
+        unread = Notification.objects.filter(user=request.user, is_read=False)
+        marked = unread.filter(id__in=ids).update(is_read=True)
+        return Response({'marked_as_read': marked, 'unread_count': unread.count()})
     def retrieve(self, request, *args, **kwargs):
         """
         When a user fetches a single notification detail, 
@@ -360,7 +476,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
         # Only mark as read if it hasn't been read yet
         if not instance.is_read:
             instance.is_read = True
-            instance.save()
+            instance.save(update_fields=['is_read'])
             
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -434,22 +550,27 @@ class UserProfileView(RetrieveUpdateAPIView):
         # این متد باعث می‌شود که API فقط اطلاعات خود کاربر لاگین شده را برگرداند
         return self.request.user
     
-class OrderHistoryView(APIView):
+class OrderHistoryView(QueryBudgetMixin, APIView):
+    """
+    Purchases of a buyer, or sales of a seller/admin, cursor-paginated
+    (?sales_cursor= / ?purchases_cursor=). ?format=ndjson streams them all.
+    """
     permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    query_budgets = {'get': 1}
 
     def get(self, request):
         user = request.user
         if user.role == 'buyer':
             # خریدهایی که این کاربر انجام داده
-            orders = Order.objects.filter(buyer=user)
+            section = 'purchases'
         else:
             # فروش‌هایی که برای این فروشنده ثبت شده
-            orders = Order.objects.filter(book__seller=user)
-        
-        # در اینجا باید اطلاعات را با یک Serializer به JSON تبدیل کنید
-        # serializer = OrderSerializer(orders, many=True)
-        # return Response(serializer.data)
-        return Response({"message": "order list"})
+            section = 'sales'
+
+        if request.accepted_renderer.format == 'ndjson':
+            return history.stream(user, [section])
+        return Response(history.paginate(request, self, user, section))
     
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -457,27 +578,39 @@ from rest_framework.permissions import IsAuthenticated
 from .models import Order
 from .serializers import OrderHistorySerializer
 
-class UserActivityHistoryView(APIView):
+class UserActivityHistoryView(QueryBudgetMixin, APIView):
+    """
+    Purchases and sales of the current user, each with its own cursor
+    (?purchases_cursor=, ?sales_cursor=). ?section=purchases|sales returns
+    only one of them; ?format=ndjson (or Accept: application/x-ndjson)
+    streams the complete history instead of a page.
+    """
     permission_classes = [IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+    query_budgets = {'get': 2}
 
     def get(self, request):
         user = request.user # کاربری که همین الان لاگین کرده
-        
-        # فقط سفارشاتی که این شخص خریده است (مرتب شده بر اساس جدیدترین)
-        purchases = Order.objects.filter(buyer=user).order_by('-created_at')
-        
-        # فقط سفارشاتی که مربوط به کتاب‌های فروشی این شخص است (مرتب شده بر اساس جدیدترین)
-        sales = Order.objects.filter(book__seller=user).order_by('-created_at')
 
-        return Response({
-            "purchases": OrderHistorySerializer(purchases, many=True).data,
-            "sales": OrderHistorySerializer(sales, many=True).data
-        })
+        sections = list(history.SECTIONS)
+        section = request.query_params.get('section')
+        if section:
+            if section not in history.SECTIONS:
+                return Response({'error': "'section' must be 'purchases' or 'sales'."}, status=status.HTTP_400_BAD_REQUEST)
+            sections = [section]
+
+        if request.accepted_renderer.format == 'ndjson':
+            return history.stream(user, sections)
+
+        # Newest first, one page per section
+        return Response({name: history.paginate(request, self, user, name) for name in sections})
     
-class FavoriteViewSet(viewsets.ModelViewSet):
+class FavoriteViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     queryset = Favorite.objects.all()
     serializer_class = FavoriteSerializer # باید در serializers.py ساخته شود
     permission_classes = [permissions.IsAuthenticated]
+    # Nested BookSerializer may reload the category map once (+1 query)
+    query_budgets = {'list': 2, 'retrieve': 2}
 
     def get_queryset(self):
         # هر کس فقط علاقه‌مندی‌های خودش را ببیند
@@ -486,17 +619,19 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class TransactionViewSet(QueryBudgetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 1, 'retrieve': 1}
 
     def get_queryset(self):
         # Users only see transactions related to their own orders
         return Transaction.objects.filter(order__buyer=self.request.user)
     
-class SupportTicketViewSet(viewsets.ModelViewSet):
+class SupportTicketViewSet(QueryBudgetMixin, viewsets.ModelViewSet):
     serializer_class = SupportTicketSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'list': 1, 'retrieve': 1}
 
     def get_queryset(self):
         # Admins see all tickets, regular users see only their own
@@ -545,35 +680,60 @@ class AdminReportView(APIView):
 
 
     def get(self, request):
-        # 1. Count active users (is_active=True)
-        active_users_count = User.objects.filter(is_active=True).count()
-        
-        # 2. Count total registered books
-        total_books_count = Book.objects.count()
-        
-        # 3. Extra stats: count approved vs pending books
-        approved_books = Book.objects.filter(is_approved=True).count()
-        pending_books = Book.objects.filter(is_approved=False).count()
+        # All counters live in one pre-aggregated row (see core/stats.py)
+        stats = get_stats()
 
         # Returning the data in a clean dictionary
-        return Response({
-            "active_users": active_users_count,
-            "total_books": total_books_count,
+        report = {
+            "active_users": stats.active_users,
+            "total_books": stats.total_books,
             "books_breakdown": {
-                "approved": approved_books,
-                "pending": pending_books
-            }
-        }, status=status.HTTP_200_OK)
+                "approved": stats.approved_books,
+                "pending": stats.pending_books,
+            },
+        }
+        # The homepage shows the counts above to everybody; sales figures are for admins only
+        user = request.user
+        if user.is_authenticated and (user.is_staff or user.role == 'admin'):
+            report["books_breakdown"]["sold"] = stats.sold_books
+            report.update({
+                "total_orders": stats.total_orders,
+                "revenue": str(stats.revenue),
+                "updated_at": stats.updated_at,
+            })
+        return Response(report, status=status.HTTP_200_OK)
 
 
 
 # core/views.py
 
-class SellerSalesView(APIView):
+class AdminExportView(APIView):
+    """
+    Admin-only streaming export of orders, transactions or books as CSV
+    (default, ?format=csv) or NDJSON (?format=ndjson).
+    Filters: ?start=YYYY-MM-DD&end=YYYY-MM-DD on created_at, and
+    ?status= (comma-separated).
+    """
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+
+    def get(self, request, dataset):
+        try:
+            queryset = exports.export_queryset(dataset, request.query_params)
+        except exports.ExportError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return exports.stream(dataset, queryset, request.accepted_renderer.format)
+
+
+class SellerSalesView(QueryBudgetMixin, APIView):
     """
     API View for sellers to track their successful sales and revenue.
+    Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD limit both the totals and
+    the (cursor-paginated) sales history.
     """
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'get': 2}
 
     def get(self, request):
         # Security check: only users with 'seller' role or admins
@@ -581,23 +741,51 @@ class SellerSalesView(APIView):
             return Response({"error": "Access denied. Seller role required."}, status=403)
 
         # Get all paid orders for books owned by this seller
-        sales = Order.objects.filter(book__seller=request.user, status='paid').select_related('book', 'buyer')
-        
-        total_revenue = sum(order.book.price for order in sales)
-        
+        sales = Order.objects.filter(book__seller=request.user, status='paid')
+
+        # Midnight bounds in the current time zone: comparing created_at itself
+        # (not its __date) lets the database use the created_at index
+        for param, lookup, days in (('start', 'created_at__gte', 0), ('end', 'created_at__lt', 1)):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+            except ValueError:
+                # Well formed but not a real day, e.g. 2024-13-01
+                day = None
+            if day is None:
+                return Response({"error": f"'{param}' must be a date in YYYY-MM-DD format."}, status=400)
+            try:
+                midnight = datetime.datetime.combine(day + datetime.timedelta(days=days), datetime.time.min)
+            except OverflowError:
+                # end=9999-12-31: nothing is later, so there is no upper bound
+                continue
+            sales = sales.filter(**{lookup: timezone.make_aware(midnight)})
+
+        # Count and revenue are computed by the database in a single query
+        totals = sales.aggregate(total_sales_count=Count('id'), total_revenue=Sum('book__price'))
+
+        # History rows are plain dicts, one page at a time
+        paginator = CreatedAtCursorPagination()
+        rows = paginator.paginate_queryset(
+            sales.values('id', 'created_at', 'status', book_title=F('book__title'),
+                         price=F('book__price'), buyer_name=F('buyer__username')),
+            request, view=self
+        )
         sales_data = [{
-            "order_id": order.id,
-            "book_title": order.book.title,
-            "price": order.book.price,
-            "buyer": order.buyer.username,
-            "purchase_date": order.created_at,
-            "status": order.status
-        } for order in sales]
+            "order_id": row['id'],
+            "book_title": row['book_title'],
+            "price": row['price'],
+            "buyer": row['buyer_name'],
+            "purchase_date": row['created_at'],
+            "status": row['status']
+        } for row in rows]
 
         return Response({
-            "total_sales_count": sales.count(),
-            "total_revenue": total_revenue,
-            "sales_history": sales_data
+            "total_sales_count": totals['total_sales_count'],
+            "total_revenue": totals['total_revenue'] or 0,
+            "sales_history": paginator.get_paginated_response(sales_data).data
         }, status=status.HTTP_200_OK)
     
 